@@ -1,26 +1,34 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import BaseModel, Field, EmailStr, computed_field, TypeAdapter
+from typing import List, Optional, Dict, Any, Mapping, Tuple
+from typing_extensions import TypedDict, NotRequired
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+import jwt
 import os
-import uuid
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
-import openai
 import asyncio
 from enum import Enum
-import json
-import base64
-from io import BytesIO
-from PIL import Image
-import requests
+import orjson
+import hashlib
+import httpx
 import math
+import re
+import time
+from collections import Counter, OrderedDict
+from functools import cached_property, lru_cache
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from types import MappingProxyType
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -32,25 +40,73 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
-# MongoDB connection
+# MongoDB connection (native asyncio driver, no executor thread hop per query)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncMongoClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password hashing (work factor pinned so a passlib upgrade can't silently change it)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
 
 # JWT token handling
 security = HTTPBearer()
 
-# OpenAI client
-if OPENAI_API_KEY:
-    openai.api_key = OPENAI_API_KEY
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# OpenAI client (async, so completions don't block the event loop). The SDK is
+# imported on first use: it is a third of the module's import time and most
+# requests never touch it. Callers check OPENAI_API_KEY first.
+# The SDK's default read timeout is 10 minutes; fail fast instead and let its
+# built-in retries (exponential backoff on timeouts, connection errors, 429s
+# and 5xx) absorb transient failures. Long plan generations pass their own timeout.
+OPENAI_TIMEOUT_SECONDS = 30.0
+OPENAI_PLAN_TIMEOUT_SECONDS = 90.0
+OPENAI_MAX_RETRIES = 2
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        max_retries=OPENAI_MAX_RETRIES
+    )
+
+# Shared outbound HTTP client (async, pooled); use this instead of blocking libraries
+http_client = httpx.AsyncClient(
+    timeout=10.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
+# App lifecycle: indexes are in place before the first request is accepted
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Must run before ensure_indexes, which would otherwise create the collections implicitly
+    try:
+        await ensure_time_series_collections()
+    except Exception as e:
+        logger.warning(f"Could not create time-series collections: {str(e)}")
+    # Indexes are created one by one; any Mongo rejects is logged rather than fatal
+    await ensure_indexes()
+    try:
+        await backfill_exercise_has_video()
+    except Exception as e:
+        logger.warning(f"Could not backfill exercises.has_video: {str(e)}")
+    try:
+        await backfill_name_lc()
+    except Exception as e:
+        logger.warning(f"Could not backfill name_lc: {str(e)}")
+    
+    yield
+    
+    await http_client.aclose()
+    # Only close the OpenAI connection pool if something actually created it
+    if get_openai_client.cache_info().currsize:
+        await get_openai_client().close()
+    await client.close()
 
 # FastAPI app
-app = FastAPI(title="DRACCO API", version="1.0.0")
+app = FastAPI(title="DRACCO API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # CORS middleware
@@ -62,6 +118,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Document ids
+# Version nibble (7) and RFC 4122 variant bits of a UUIDv7
+_UUID7_CLEAR_MASK = ~(0xF << 76 | 0x3 << 62)
+_UUID7_SET_BITS = 0x7 << 76 | 0x2 << 62
+
+def new_id() -> str:
+    """Time-ordered UUIDv7 string, so new ids append at the right edge of B-tree indexes"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    h = (value & _UUID7_CLEAR_MASK | _UUID7_SET_BITS).to_bytes(16, "big").hex()
+    # Format directly; building a uuid.UUID just to str() it was half the cost
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
 # Enums
 class Gender(str, Enum):
     male = "male"
@@ -120,7 +188,7 @@ class UserEvaluation(BaseModel):
     equipment_available: List[str] = []
 
 class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     email: EmailStr
     full_name: str
     hashed_password: str
@@ -129,9 +197,16 @@ class User(BaseModel):
     evaluation: Optional[UserEvaluation] = None
     tmb: Optional[float] = None
     daily_calories: Optional[float] = None
+    
+    # Authenticated users are reused across requests from _token_cache, so the dump
+    # is built once per session; invalidate_cached_user drops it on profile changes.
+    # Read-only: callers must not mutate the returned dict.
+    @cached_property
+    def evaluation_dict(self) -> dict:
+        return self.evaluation.model_dump() if self.evaluation else {}
 
 class Exercise(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     description: str
     type: ExerciseType
@@ -145,6 +220,7 @@ class Exercise(BaseModel):
     video_thumbnail: Optional[str] = None
     image_url: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
     # Advanced fields
     secondary_muscles: List[str] = []
     preparation_steps: List[str] = []
@@ -159,6 +235,12 @@ class Exercise(BaseModel):
     created_by: str = "system"
     rating: float = 0.0
     review_count: int = 0
+    
+    # Stored alongside video_url so the has_video filter is a single indexed equality match
+    @computed_field
+    @property
+    def has_video(self) -> bool:
+        return bool(self.video_url)
 
 class ExerciseFilter(BaseModel):
     name: Optional[str] = None
@@ -177,7 +259,7 @@ class ExerciseFilter(BaseModel):
     offset: Optional[int] = 0
 
 class ExerciseReview(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     exercise_id: str
     user_id: str
     rating: int  # 1-5 stars
@@ -185,7 +267,7 @@ class ExerciseReview(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Food(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     calories_per_100g: float
     protein: float
@@ -233,7 +315,7 @@ class NutritionLabel(BaseModel):
     recommendations: List[str]
 
 class Supplement(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     category: str  # protein, vitamins, minerals, etc.
     description: str
@@ -249,7 +331,7 @@ class Supplement(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class SupplementRecommendation(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     supplement_id: str
     reason: str
@@ -257,8 +339,10 @@ class SupplementRecommendation(BaseModel):
     confidence: float  # 0-1
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-class Meal(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+# Meal and WorkoutSession only ever live nested inside a plan, so they are TypedDicts:
+# the parent model validates them as plain dicts instead of building a model per entry
+class Meal(TypedDict):
+    id: str
     name: str
     foods: List[Dict[str, Any]]  # {food_id, quantity}
     total_calories: float
@@ -266,10 +350,11 @@ class Meal(BaseModel):
     total_carbs: float
     total_fat: float
     meal_type: str  # breakfast, lunch, dinner, snack
-    instructions: str = ""
+    instructions: NotRequired[str]
+    ingredients: NotRequired[List[str]]
 
 class NutritionPlan(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     week_number: int
     daily_calories: float
@@ -279,8 +364,19 @@ class NutritionPlan(BaseModel):
     shopping_list: List[str] = []
     plan_name: str = "Plan Nutricional Personalizado"
 
+# List views only show these fields; the meals are loaded per plan
+class NutritionPlanSummary(BaseModel):
+    id: str
+    user_id: str
+    week_number: int
+    daily_calories: float
+    created_at: datetime
+    plan_name: str = "Plan Nutricional Personalizado"
+
+NUTRITION_PLAN_SUMMARY_PROJECTION = {"_id": 0, "meals": 0, "tips": 0, "shopping_list": 0}
+
 class ShoppingList(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     plan_id: Optional[str] = None
     name: str = "Lista de Compras"
@@ -292,7 +388,7 @@ class ShoppingList(BaseModel):
     categories: List[str] = []
 
 class ShoppingItem(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     quantity: str
     unit: str = "unidades"
@@ -305,8 +401,8 @@ class ShoppingItem(BaseModel):
     nutritional_priority: Optional[str] = None  # high, medium, low
     urgency: Optional[str] = None  # urgent, normal, optional
 
-class WorkoutSession(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class WorkoutSession(TypedDict):
+    id: str
     name: str
     exercises: List[Dict[str, Any]]  # {exercise_id, sets, reps, weight, duration}
     total_duration: int
@@ -314,14 +410,22 @@ class WorkoutSession(BaseModel):
     focus_areas: List[str]
 
 class WorkoutPlan(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     week_number: int
     sessions: Dict[str, WorkoutSession]  # {day: session}
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class WorkoutPlanSummary(BaseModel):
+    id: str
+    user_id: str
+    week_number: int
+    created_at: datetime
+
+WORKOUT_PLAN_SUMMARY_PROJECTION = {"_id": 0, "sessions": 0}
+
 class ProgressEntry(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     date: datetime = Field(default_factory=datetime.utcnow)
     weight: Optional[float] = None
@@ -331,8 +435,19 @@ class ProgressEntry(BaseModel):
     photos: List[str] = []  # base64 encoded images
     notes: str = ""
 
+# The history view never renders photos; they are loaded per entry
+class ProgressSummary(BaseModel):
+    id: str
+    user_id: str
+    date: datetime
+    weight: Optional[float] = None
+    muscle_mass: Optional[float] = None
+    body_fat: Optional[float] = None
+    measurements: Dict[str, float] = {}
+    notes: str = ""
+
 class WaterIntake(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     date: datetime = Field(default_factory=datetime.utcnow)
     amount_ml: float
@@ -343,14 +458,14 @@ class WaterIntakeRequest(BaseModel):
     goal_ml: float = 2000
 
 class ChatMessage(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     message: str
     response: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class Notification(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     title: str
     message: str
@@ -359,7 +474,7 @@ class Notification(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ForumPost(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     title: str
     content: str
@@ -368,8 +483,13 @@ class ForumPost(BaseModel):
     replies: List[Dict[str, Any]] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Exactly the model fields, for list endpoints that return stored documents without revalidating them
+CHAT_MESSAGE_PROJECTION = {"_id": 0, **dict.fromkeys(ChatMessage.model_fields, 1)}
+NOTIFICATION_PROJECTION = {"_id": 0, **dict.fromkeys(Notification.model_fields, 1)}
+FORUM_POST_PROJECTION = {"_id": 0, **dict.fromkeys(ForumPost.model_fields, 1)}
+
 class HealthMetrics(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     bmi: float
     body_fat_percentage: Optional[float] = None
@@ -384,7 +504,7 @@ class HealthMetrics(BaseModel):
     recommendations: List[str] = []
 
 class BodyMeasurements(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     date: datetime = Field(default_factory=datetime.utcnow)
     weight: Optional[float] = None
@@ -405,6 +525,7 @@ class HealthMetricsRequest(BaseModel):
     gender: Gender
     activity_level: ActivityLevel
     body_fat_percentage: Optional[float] = None
+    neck_circumference: Optional[float] = None
     waist_circumference: Optional[float] = None
     hip_circumference: Optional[float] = None
 
@@ -415,7 +536,7 @@ class PhotoAnalysisRequest(BaseModel):
     previous_photos: List[str] = []  # for comparison
 
 class PhotoAnalysisResult(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     analysis_type: str
     image_base64: str
@@ -430,7 +551,7 @@ class FoodRecognitionRequest(BaseModel):
     meal_type: str = "unknown"  # breakfast, lunch, dinner, snack
 
 class FoodRecognitionResult(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     image_base64: str
     recognized_foods: List[Dict[str, Any]]
@@ -442,7 +563,7 @@ class FoodRecognitionResult(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class PatternAlert(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     alert_type: str  # abandonment, plateau, goal_deviation, health_concern
     severity: str  # low, medium, high, critical
@@ -471,6 +592,87 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+# In-process caching
+class TTLCache:
+    """Small LRU cache whose entries expire after a (per-entry) time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def evict(self, predicate) -> None:
+        """Drop every entry whose value matches predicate"""
+        for key in [k for k, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+# Validated bearer tokens -> User, bounded by the token's own expiry
+TOKEN_CACHE_TTL_SECONDS = 300
+_token_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(user_id: str) -> None:
+    """Forget cached sessions for a user whose document just changed"""
+    _token_cache.evict(lambda user: user.id == user_id)
+
+# Catalog list responses, stored as encoded JSON plus its ETag keyed by the request filters.
+# Every write to a catalog collection clears its cache; the TTL bounds staleness
+# across workers, which don't see each other's writes.
+CATALOG_CACHE_TTL_SECONDS = 60
+_exercise_list_cache = TTLCache(maxsize=256, ttl=CATALOG_CACHE_TTL_SECONDS)
+_food_list_cache = TTLCache(maxsize=256, ttl=CATALOG_CACHE_TTL_SECONDS)
+# Per-type exercise stats: a full-collection $group, cached under a single key
+_exercise_stats_cache = TTLCache(maxsize=1, ttl=CATALOG_CACHE_TTL_SECONDS)
+_exercise_list_adapter = TypeAdapter(List[Exercise])
+_food_list_adapter = TypeAdapter(List[Food])
+
+def encode_catalog_list(adapter: TypeAdapter, docs: List[dict]) -> Tuple[bytes, str]:
+    """Validate and encode documents exactly as the endpoint's response_model would"""
+    body = adapter.dump_json(adapter.validate_python(docs))
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def catalog_response(entry: Tuple[bytes, str], if_none_match: Optional[str]) -> Response:
+    """Cached catalog body, or an empty 304 when the client already holds this version"""
+    body, etag = entry
+    headers = {"ETag": etag}
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# OpenAI completion text keyed by a hash of the exact request, so repeated
+# questions and identical profiles don't pay for another round trip
+AI_RESPONSE_CACHE_TTL_SECONDS = 86400
+_ai_response_cache = TTLCache(maxsize=2048, ttl=AI_RESPONSE_CACHE_TTL_SECONDS)
+
+def ai_cache_key(model: str, messages: List[dict]) -> str:
+    payload = orjson.dumps([model, messages], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
 # Helper functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -489,23 +691,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    cached_user = _token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(
+            token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]}
+        )
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
     
     user = await db.users.find_one({"id": user_id})
     if user is None:
         raise credentials_exception
-    return User(**user)
+    user = User(**user)
+    
+    # Only successfully validated tokens are cached, and never past their exp claim
+    ttl = min(TOKEN_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _token_cache.set(token, user, ttl=ttl)
+    return user
 
 def calculate_bmi(weight: float, height: float) -> float:
     """Calculate Body Mass Index"""
@@ -517,7 +732,7 @@ def get_bmi_category(bmi: float) -> str:
     if bmi < 18.5:
         return "Bajo peso"
     elif bmi < 25:
-        return "Peso normal"
+        return "Normal"
     elif bmi < 30:
         return "Sobrepeso"
     else:
@@ -583,16 +798,7 @@ def calculate_daily_calorie_needs(weight: float, height: float, age: int, gender
     else:
         bmr_mifflin = (10 * weight) + (6.25 * height) - (5 * age) - 161
     
-    # Activity multipliers
-    activity_multipliers = {
-        "sedentary": 1.2,
-        "lightly_active": 1.375,
-        "moderately_active": 1.55,
-        "very_active": 1.725,
-        "extremely_active": 1.9
-    }
-    
-    multiplier = activity_multipliers.get(activity_level, 1.2)
+    multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, 1.2)
     
     return {
         "bmr_harris": round(bmr_harris, 0),
@@ -603,12 +809,23 @@ def calculate_daily_calorie_needs(weight: float, height: float, age: int, gender
         "recommended_tdee": round(bmr_mifflin * multiplier, 0)
     }
 
+def match_any(values: List[str]):
+    """Array-field filter matching any of values; a single value becomes a plain equality"""
+    return values[0] if len(values) == 1 else {"$in": values}
+
+# Catalog documents minus the search and seeding bookkeeping fields
+CATALOG_PUBLIC_PROJECTION = {"_id": 0, "name_lc": 0, "seed_key": 0}
+
+def name_prefix_match(text: str) -> dict:
+    """Case-insensitive name prefix filter; an anchored regex on name_lc stays on its index"""
+    return {"name_lc": {"$regex": "^" + re.escape(text.strip().lower())}}
+
 def build_exercise_query(filters: ExerciseFilter) -> dict:
     """Build MongoDB query from exercise filters"""
     query = {}
     
     if filters.name:
-        query["name"] = {"$regex": filters.name, "$options": "i"}
+        query.update(name_prefix_match(filters.name))
     
     if filters.type:
         query["type"] = filters.type
@@ -617,10 +834,10 @@ def build_exercise_query(filters: ExerciseFilter) -> dict:
         query["difficulty"] = filters.difficulty
     
     if filters.muscle_groups:
-        query["muscle_groups"] = {"$in": filters.muscle_groups}
+        query["muscle_groups"] = match_any(filters.muscle_groups)
     
     if filters.equipment:
-        query["equipment"] = {"$in": filters.equipment}
+        query["equipment"] = match_any(filters.equipment)
     
     if filters.duration_range:
         duration_query = {}
@@ -650,17 +867,10 @@ def build_exercise_query(filters: ExerciseFilter) -> dict:
             query["intensity_level"] = intensity_query
     
     if filters.tags:
-        query["tags"] = {"$in": filters.tags}
+        query["tags"] = match_any(filters.tags)
     
     if filters.has_video is not None:
-        if filters.has_video:
-            query["video_url"] = {"$ne": None, "$ne": ""}
-        else:
-            query["$or"] = [
-                {"video_url": {"$exists": False}},
-                {"video_url": None},
-                {"video_url": ""}
-            ]
+        query["has_video"] = filters.has_video
     
     return query
 
@@ -668,40 +878,145 @@ def calculate_food_health_score(food: dict) -> float:
     """Calculate health score for a food item (0-100)"""
     score = 50  # Base score
     
-    # Protein bonus
-    protein_per_100_cal = (food.get("protein", 0) * 4) / max(food.get("calories_per_100g", 1), 1) * 100
-    score += min(protein_per_100_cal * 0.3, 20)
-    
-    # Fiber bonus
-    fiber_per_100_cal = food.get("fiber", 0) / max(food.get("calories_per_100g", 1), 1) * 100
-    score += min(fiber_per_100_cal * 0.5, 15)
-    
-    # Sugar penalty
-    sugar_per_100_cal = food.get("sugar", 0) / max(food.get("calories_per_100g", 1), 1) * 100
-    score -= min(sugar_per_100_cal * 0.2, 15)
-    
-    # Sodium penalty
-    sodium_per_100_cal = food.get("sodium", 0) / max(food.get("calories_per_100g", 1), 1) * 100
-    score -= min(sodium_per_100_cal * 0.1, 10)
-    
-    # Saturated fat penalty
-    saturated_fat_per_100_cal = (food.get("saturated_fat", 0) * 9) / max(food.get("calories_per_100g", 1), 1) * 100
-    score -= min(saturated_fat_per_100_cal * 0.1, 10)
-    
-    # Trans fat penalty
-    trans_fat = food.get("trans_fat", 0)
-    if trans_fat > 0:
-        score -= 20
+    # Positive factors
+    if food.get("protein", 0) >= 10:
+        score += 15
+    if food.get("fiber", 0) >= 5:
+        score += 10
+    if food.get("vitamin_c", 0) >= 10:
+        score += 5
+    if food.get("calcium", 0) >= 100:
+        score += 5
     
-    # Vitamin and mineral bonus
-    vitamins_minerals = ["vitamin_c", "vitamin_a", "vitamin_d", "calcium", "iron", "potassium"]
-    for nutrient in vitamins_minerals:
-        if food.get(nutrient, 0) > 0:
-            score += 2
+    # Negative factors
+    if food.get("sugar", 0) >= 20:
+        score -= 15
+    if food.get("sodium", 0) >= 500:
+        score -= 10
+    if food.get("saturated_fat", 0) >= 10:
+        score -= 10
     
     return max(0, min(100, score))
 
-def generate_supplement_recommendations(user_evaluation: dict, health_metrics: dict) -> List[dict]:
+# Scores of catalog foods by id. Foods are only written by /initialize-data, which
+# clears this; the TTL bounds staleness across workers like the catalog list cache.
+_food_health_score_cache = TTLCache(maxsize=4096, ttl=CATALOG_CACHE_TTL_SECONDS)
+
+def food_health_score(food: dict) -> float:
+    """calculate_food_health_score for a stored food, memoized by its id"""
+    food_id = food.get("id")
+    if food_id is None:
+        return calculate_food_health_score(food)
+    score = _food_health_score_cache.get(food_id)
+    if score is None:
+        score = calculate_food_health_score(food)
+        _food_health_score_cache.set(food_id, score)
+    return score
+
+# Supplement recommendation templates; static, so built once and shared read-only
+BASIC_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "Multivitamínico",
+        "category": "vitamins",
+        "reason": "Cubre deficiencias nutricionales básicas",
+        "priority": 3,
+        "confidence": 0.8
+    }),
+    MappingProxyType({
+        "name": "Omega-3",
+        "category": "fatty_acids",
+        "reason": "Mejora la salud cardiovascular y reduce la inflamación",
+        "priority": 3,
+        "confidence": 0.7
+    }),
+)
+
+MUSCLE_GAIN_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "Proteína Whey",
+        "category": "protein",
+        "reason": "Apoya el crecimiento muscular y recuperación",
+        "priority": 5,
+        "confidence": 0.9
+    }),
+    MappingProxyType({
+        "name": "Creatina",
+        "category": "performance",
+        "reason": "Mejora la fuerza y potencia muscular",
+        "priority": 4,
+        "confidence": 0.8
+    }),
+)
+
+WEIGHT_LOSS_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "L-Carnitina",
+        "category": "fat_burner",
+        "reason": "Ayuda en la oxidación de grasas",
+        "priority": 3,
+        "confidence": 0.6
+    }),
+    MappingProxyType({
+        "name": "Fibra",
+        "category": "digestive",
+        "reason": "Aumenta la saciedad y mejora la digestión",
+        "priority": 3,
+        "confidence": 0.7
+    }),
+)
+
+HIGH_ACTIVITY_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "BCAA",
+        "category": "amino_acids",
+        "reason": "Reduce la fatiga muscular durante entrenamientos intensos",
+        "priority": 3,
+        "confidence": 0.7
+    }),
+    MappingProxyType({
+        "name": "Magnesio",
+        "category": "minerals",
+        "reason": "Mejora la recuperación muscular y calidad del sueño",
+        "priority": 3,
+        "confidence": 0.8
+    }),
+)
+
+OVER_40_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "Vitamina D3",
+        "category": "vitamins",
+        "reason": "Mantiene la salud ósea y función inmune",
+        "priority": 4,
+        "confidence": 0.8
+    }),
+    MappingProxyType({
+        "name": "Colágeno",
+        "category": "joints",
+        "reason": "Apoya la salud articular y de la piel",
+        "priority": 3,
+        "confidence": 0.7
+    }),
+)
+
+FEMALE_SUPPLEMENTS = (
+    MappingProxyType({
+        "name": "Hierro",
+        "category": "minerals",
+        "reason": "Previene la anemia ferropénica",
+        "priority": 4,
+        "confidence": 0.7
+    }),
+    MappingProxyType({
+        "name": "Ácido Fólico",
+        "category": "vitamins",
+        "reason": "Importante para la salud reproductiva",
+        "priority": 3,
+        "confidence": 0.8
+    }),
+)
+
+def generate_supplement_recommendations(user_evaluation: dict, health_metrics: dict) -> List[Mapping[str, Any]]:
     """Generate personalized supplement recommendations"""
     recommendations = []
     
@@ -717,128 +1032,32 @@ def generate_supplement_recommendations(user_evaluation: dict, health_metrics: d
         gender = user_evaluation.get("gender", "")
         activity_level = user_evaluation.get("activity_level", "")
     
-    # Basic recommendations for everyone
-    basic_supplements = [
-        {
-            "name": "Multivitamínico",
-            "category": "vitamins",
-            "reason": "Cubre deficiencias nutricionales básicas",
-            "priority": 3,
-            "confidence": 0.8
-        },
-        {
-            "name": "Omega-3",
-            "category": "fatty_acids",
-            "reason": "Mejora la salud cardiovascular y reduce la inflamación",
-            "priority": 3,
-            "confidence": 0.7
-        }
-    ]
-    
     # Goal-specific recommendations
     if goal == "build_muscle" or goal == "gain_weight":
-        recommendations.extend([
-            {
-                "name": "Proteína Whey",
-                "category": "protein",
-                "reason": "Apoya el crecimiento muscular y recuperación",
-                "priority": 5,
-                "confidence": 0.9
-            },
-            {
-                "name": "Creatina",
-                "category": "performance",
-                "reason": "Mejora la fuerza y potencia muscular",
-                "priority": 4,
-                "confidence": 0.8
-            }
-        ])
+        recommendations.extend(MUSCLE_GAIN_SUPPLEMENTS)
     
     elif goal == "lose_weight":
-        recommendations.extend([
-            {
-                "name": "L-Carnitina",
-                "category": "fat_burner",
-                "reason": "Ayuda en la oxidación de grasas",
-                "priority": 3,
-                "confidence": 0.6
-            },
-            {
-                "name": "Fibra",
-                "category": "digestive",
-                "reason": "Aumenta la saciedad y mejora la digestión",
-                "priority": 3,
-                "confidence": 0.7
-            }
-        ])
+        recommendations.extend(WEIGHT_LOSS_SUPPLEMENTS)
     
     # Activity level recommendations
     if activity_level in ["very_active", "extremely_active"]:
-        recommendations.extend([
-            {
-                "name": "BCAA",
-                "category": "amino_acids",
-                "reason": "Reduce la fatiga muscular durante entrenamientos intensos",
-                "priority": 3,
-                "confidence": 0.7
-            },
-            {
-                "name": "Magnesio",
-                "category": "minerals",
-                "reason": "Mejora la recuperación muscular y calidad del sueño",
-                "priority": 3,
-                "confidence": 0.8
-            }
-        ])
+        recommendations.extend(HIGH_ACTIVITY_SUPPLEMENTS)
     
     # Age-specific recommendations
     if age > 40:
-        recommendations.extend([
-            {
-                "name": "Vitamina D3",
-                "category": "vitamins",
-                "reason": "Mantiene la salud ósea y función inmune",
-                "priority": 4,
-                "confidence": 0.8
-            },
-            {
-                "name": "Colágeno",
-                "category": "joints",
-                "reason": "Apoya la salud articular y de la piel",
-                "priority": 3,
-                "confidence": 0.7
-            }
-        ])
+        recommendations.extend(OVER_40_SUPPLEMENTS)
     
     # Gender-specific recommendations
     if gender == "female":
-        recommendations.extend([
-            {
-                "name": "Hierro",
-                "category": "minerals",
-                "reason": "Previene la anemia ferropénica",
-                "priority": 4,
-                "confidence": 0.7
-            },
-            {
-                "name": "Ácido Fólico",
-                "category": "vitamins",
-                "reason": "Importante para la salud reproductiva",
-                "priority": 3,
-                "confidence": 0.8
-            }
-        ])
+        recommendations.extend(FEMALE_SUPPLEMENTS)
     
     # Add basic supplements
-    recommendations.extend(basic_supplements)
+    recommendations.extend(BASIC_SUPPLEMENTS)
     
     # Remove duplicates and sort by priority
-    unique_recommendations = {}
-    for rec in recommendations:
-        if rec["name"] not in unique_recommendations:
-            unique_recommendations[rec["name"]] = rec
+    unique_recommendations = {rec["name"]: rec for rec in recommendations}
     
-    return sorted(unique_recommendations.values(), key=lambda x: x["priority"], reverse=True)
+    return sorted(unique_recommendations.values(), key=itemgetter("priority"), reverse=True)
 
 def generate_smart_shopping_list(nutrition_plan: dict, user_preferences: dict) -> dict:
     """Generate intelligent shopping list from nutrition plan"""
@@ -905,119 +1124,138 @@ def generate_smart_shopping_list(nutrition_plan: dict, user_preferences: dict) -
         "estimated_cost": estimate_shopping_cost(shopping_items)
     }
 
+def _keyword_pattern(words) -> re.Pattern:
+    """Compile substring keywords into one alternation, scanned in a single C-level pass"""
+    return re.compile("|".join(map(re.escape, words)))
+
+# Shopping list keyword tables, compiled once; categories are checked in order and the first match wins
+INGREDIENT_CATEGORY_PATTERNS = tuple((_keyword_pattern(words), category) for category, words in (
+    ("Carnes y pescados", ["pollo", "carne", "pescado", "atún", "salmón", "pavo"]),
+    ("Lácteos y huevos", ["leche", "yogur", "queso", "huevo"]),
+    ("Frutas", ["manzana", "plátano", "naranja", "fresa", "uva"]),
+    ("Verduras", ["lechuga", "tomate", "cebolla", "zanahoria", "brócoli"]),
+    ("Cereales y granos", ["arroz", "pasta", "pan", "avena", "quinoa"]),
+    ("Aceites y condimentos", ["aceite", "sal", "pimienta", "ajo", "especias"]),
+    ("Frutos secos y semillas", ["nuez", "almendra", "cacahuete", "semilla"]),
+))
+HIGH_PRIORITY_PATTERN = _keyword_pattern(["proteína", "pollo", "pescado", "huevo", "quinoa", "avena", "brócoli", "espinaca"])
+MEDIUM_PRIORITY_PATTERN = _keyword_pattern(["arroz", "pasta", "leche", "yogur", "manzana", "plátano"])
+
 def categorize_ingredient(ingredient: str) -> str:
     """Categorize ingredient for shopping list"""
     ingredient_lower = ingredient.lower()
     
-    if any(word in ingredient_lower for word in ["pollo", "carne", "pescado", "atún", "salmón", "pavo"]):
-        return "Carnes y pescados"
-    elif any(word in ingredient_lower for word in ["leche", "yogur", "queso", "huevo"]):
-        return "Lácteos y huevos"
-    elif any(word in ingredient_lower for word in ["manzana", "plátano", "naranja", "fresa", "uva"]):
-        return "Frutas"
-    elif any(word in ingredient_lower for word in ["lechuga", "tomate", "cebolla", "zanahoria", "brócoli"]):
-        return "Verduras"
-    elif any(word in ingredient_lower for word in ["arroz", "pasta", "pan", "avena", "quinoa"]):
-        return "Cereales y granos"
-    elif any(word in ingredient_lower for word in ["aceite", "sal", "pimienta", "ajo", "especias"]):
-        return "Aceites y condimentos"
-    elif any(word in ingredient_lower for word in ["nuez", "almendra", "cacahuete", "semilla"]):
-        return "Frutos secos y semillas"
-    else:
-        return "Otros"
+    for pattern, category in INGREDIENT_CATEGORY_PATTERNS:
+        if pattern.search(ingredient_lower):
+            return category
+    return "Otros"
 
 def determine_nutritional_priority(ingredient: str) -> str:
     """Determine nutritional priority of ingredient"""
     ingredient_lower = ingredient.lower()
     
-    high_priority = ["proteína", "pollo", "pescado", "huevo", "quinoa", "avena", "brócoli", "espinaca"]
-    medium_priority = ["arroz", "pasta", "leche", "yogur", "manzana", "plátano"]
-    
-    if any(word in ingredient_lower for word in high_priority):
+    if HIGH_PRIORITY_PATTERN.search(ingredient_lower):
         return "high"
-    elif any(word in ingredient_lower for word in medium_priority):
+    elif MEDIUM_PRIORITY_PATTERN.search(ingredient_lower):
         return "medium"
     else:
         return "low"
 
+# Simplified per-category unit prices - in production, you'd use real price data
+SHOPPING_CATEGORY_COSTS = {
+    "Carnes y pescados": 8.0,
+    "Lácteos y huevos": 3.5,
+    "Frutas": 2.5,
+    "Verduras": 2.0,
+    "Cereales y granos": 1.5,
+    "Aceites y condimentos": 4.0,
+    "Frutos secos y semillas": 6.0,
+    "Otros": 3.0
+}
+
+def shopping_quantity_multiplier(quantity: str) -> float:
+    """Units implied by a shopping item's quantity bucket"""
+    if "3-5" in quantity:
+        return 4
+    elif "6+" in quantity:
+        return 7
+    else:
+        return 1.5
+
 def estimate_shopping_cost(items: List[dict]) -> float:
     """Estimate total cost of shopping list"""
-    # This is a simplified estimation - in production, you'd use real price data
-    cost_per_category = {
-        "Carnes y pescados": 8.0,
-        "Lácteos y huevos": 3.5,
-        "Frutas": 2.5,
-        "Verduras": 2.0,
-        "Cereales y granos": 1.5,
-        "Aceites y condimentos": 4.0,
-        "Frutos secos y semillas": 6.0,
-        "Otros": 3.0
-    }
-    
-    total_cost = 0
-    for item in items:
-        category = item.get("category", "Otros")
-        base_cost = cost_per_category.get(category, 3.0)
-        
-        # Adjust based on quantity
-        quantity = item.get("quantity", "1")
-        if "3-5" in quantity:
-            multiplier = 4
-        elif "6+" in quantity:
-            multiplier = 7
-        else:
-            multiplier = 1.5
-        
-        total_cost += base_cost * multiplier
-    
+    total_cost = sum(
+        SHOPPING_CATEGORY_COSTS.get(item.get("category", "Otros"), 3.0)
+        * shopping_quantity_multiplier(item.get("quantity", "1"))
+        for item in items
+    )
     return round(total_cost, 2)
 
+# Health recommendation messages, grouped by the rule that triggers them
+LOW_BMI_RECOMMENDATIONS = (
+    "Considera aumentar tu ingesta calórica de manera saludable",
+    "Incluye más proteínas y grasas saludables en tu dieta",
+    "Consulta con un nutricionista para un plan personalizado"
+)
+HIGH_BMI_RECOMMENDATIONS = (
+    "Considera reducir tu ingesta calórica gradualmente",
+    "Aumenta tu actividad física diaria",
+    "Enfócate en alimentos nutritivos y bajos en calorías"
+)
+# (too low, too high) body fat percentage per gender
+BODY_FAT_LIMITS = {"male": (6, 25), "female": (14, 32)}
+HIGH_BODY_FAT_RECOMMENDATION = "Tu porcentaje de grasa corporal es elevado, considera ejercicio cardiovascular"
+LOW_BODY_FAT_RECOMMENDATION = "Tu porcentaje de grasa corporal es muy bajo, asegúrate de mantener una nutrición adecuada"
+OVER_40_RECOMMENDATIONS = (
+    "Incluye ejercicios de resistencia para mantener la masa muscular",
+    "Considera suplementos de calcio y vitamina D"
+)
+GOAL_HEALTH_RECOMMENDATIONS = {
+    "lose_weight": (
+        "Crea un déficit calórico moderado (300-500 cal/día)",
+        "Combina ejercicio cardiovascular con entrenamiento de fuerza"
+    ),
+    "gain_weight": (
+        "Aumenta tu ingesta calórica con alimentos nutritivos",
+        "Enfócate en entrenamiento de fuerza para ganar masa muscular"
+    ),
+    "build_muscle": (
+        "Consume suficientes proteínas (1.6-2.2g por kg de peso)",
+        "Prioriza ejercicios compuestos en tu entrenamiento"
+    )
+}
+GENERAL_HEALTH_RECOMMENDATIONS = (
+    "Mantén una hidratación adecuada (2-3 litros de agua al día)",
+    "Asegúrate de dormir 7-9 horas cada noche",
+    "Realiza chequeos médicos regulares"
+)
+
 def generate_health_recommendations(bmi: float, body_fat: float, age: int, gender: str, goal: str) -> list:
     """Generate personalized health recommendations"""
     recommendations = []
     
     # BMI-based recommendations
     if bmi < 18.5:
-        recommendations.append("Considera aumentar tu ingesta calórica de manera saludable")
-        recommendations.append("Incluye más proteínas y grasas saludables en tu dieta")
-        recommendations.append("Consulta con un nutricionista para un plan personalizado")
+        recommendations.extend(LOW_BMI_RECOMMENDATIONS)
     elif bmi > 25:
-        recommendations.append("Considera reducir tu ingesta calórica gradualmente")
-        recommendations.append("Aumenta tu actividad física diaria")
-        recommendations.append("Enfócate en alimentos nutritivos y bajos en calorías")
+        recommendations.extend(HIGH_BMI_RECOMMENDATIONS)
     
-    # Body fat recommendations
-    if gender.lower() == "male":
-        if body_fat > 25:
-            recommendations.append("Tu porcentaje de grasa corporal es elevado, considera ejercicio cardiovascular")
-        elif body_fat < 6:
-            recommendations.append("Tu porcentaje de grasa corporal es muy bajo, asegúrate de mantener una nutrición adecuada")
-    else:  # female
-        if body_fat > 32:
-            recommendations.append("Tu porcentaje de grasa corporal es elevado, considera ejercicio cardiovascular")
-        elif body_fat < 14:
-            recommendations.append("Tu porcentaje de grasa corporal es muy bajo, asegúrate de mantener una nutrición adecuada")
+    # Body fat recommendations (anything but male uses the female limits)
+    low_body_fat, high_body_fat = BODY_FAT_LIMITS["male" if gender.lower() == "male" else "female"]
+    if body_fat > high_body_fat:
+        recommendations.append(HIGH_BODY_FAT_RECOMMENDATION)
+    elif body_fat < low_body_fat:
+        recommendations.append(LOW_BODY_FAT_RECOMMENDATION)
     
     # Age-based recommendations
     if age > 40:
-        recommendations.append("Incluye ejercicios de resistencia para mantener la masa muscular")
-        recommendations.append("Considera suplementos de calcio y vitamina D")
+        recommendations.extend(OVER_40_RECOMMENDATIONS)
     
     # Goal-based recommendations
-    if goal == "lose_weight":
-        recommendations.append("Crea un déficit calórico moderado (300-500 cal/día)")
-        recommendations.append("Combina ejercicio cardiovascular con entrenamiento de fuerza")
-    elif goal == "gain_weight":
-        recommendations.append("Aumenta tu ingesta calórica con alimentos nutritivos")
-        recommendations.append("Enfócate en entrenamiento de fuerza para ganar masa muscular")
-    elif goal == "build_muscle":
-        recommendations.append("Consume suficientes proteínas (1.6-2.2g por kg de peso)")
-        recommendations.append("Prioriza ejercicios compuestos en tu entrenamiento")
+    recommendations.extend(GOAL_HEALTH_RECOMMENDATIONS.get(goal, ()))
     
     # General recommendations
-    recommendations.append("Mantén una hidratación adecuada (2-3 litros de agua al día)")
-    recommendations.append("Asegúrate de dormir 7-9 horas cada noche")
-    recommendations.append("Realiza chequeos médicos regulares")
+    recommendations.extend(GENERAL_HEALTH_RECOMMENDATIONS)
     
     return recommendations
 
@@ -1029,27 +1267,56 @@ def calculate_tmb(weight: float, height: float, age: int, gender: Gender) -> flo
         tmb = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
     return tmb
 
+# Lookup tables for calculate_daily_calories, built once at import instead of per call
+ACTIVITY_MULTIPLIERS = {
+    ActivityLevel.sedentary: 1.2,
+    ActivityLevel.lightly_active: 1.375,
+    ActivityLevel.moderately_active: 1.55,
+    ActivityLevel.very_active: 1.725,
+    ActivityLevel.extremely_active: 1.9
+}
+
+GOAL_CALORIE_ADJUSTMENTS = {
+    Goal.lose_weight: -500,
+    Goal.maintain_weight: 0,
+    Goal.gain_weight: 500,
+    Goal.build_muscle: 300,
+    Goal.improve_fitness: 0
+}
+
 def calculate_daily_calories(tmb: float, activity_level: ActivityLevel, goal: Goal) -> float:
     """Calculate daily calorie needs"""
-    activity_multipliers = {
-        ActivityLevel.sedentary: 1.2,
-        ActivityLevel.lightly_active: 1.375,
-        ActivityLevel.moderately_active: 1.55,
-        ActivityLevel.very_active: 1.725,
-        ActivityLevel.extremely_active: 1.9
-    }
-    
-    maintenance_calories = tmb * activity_multipliers[activity_level]
-    
-    goal_adjustments = {
-        Goal.lose_weight: -500,
-        Goal.maintain_weight: 0,
-        Goal.gain_weight: 500,
-        Goal.build_muscle: 300,
-        Goal.improve_fitness: 0
-    }
-    
-    return maintenance_calories + goal_adjustments[goal]
+    return tmb * ACTIVITY_MULTIPLIERS[activity_level] + GOAL_CALORIE_ADJUSTMENTS[goal]
+
+CHAT_SYSTEM_PROMPT_TEMPLATE = """
+        Eres un entrenador personal y nutricionista experto. El usuario tiene los siguientes datos:
+        - Objetivo: {goal}
+        - Nivel de actividad: {activity_level}
+        - Experiencia: {experience_level}
+        - Calorías diarias recomendadas: {daily_calories}
+        
+        Proporciona consejos útiles, motivación y respuestas personalizadas sobre fitness, nutrición y salud.
+        Mantén un tono amigable y profesional. Si no tienes información suficiente, pide más detalles.
+        """
+
+@lru_cache(maxsize=1024)
+def _render_chat_system_prompt(goal, activity_level, experience_level, daily_calories) -> str:
+    return CHAT_SYSTEM_PROMPT_TEMPLATE.format(
+        goal=goal,
+        activity_level=activity_level,
+        experience_level=experience_level,
+        daily_calories=daily_calories
+    )
+
+def build_chat_system_prompt(user_context: dict) -> str:
+    """Build the coach system prompt from the user's evaluation data"""
+    # The prompt only depends on four rarely-changing fields, so reuse rendered strings
+    return _render_chat_system_prompt(
+        user_context.get('goal', 'No especificado'),
+        user_context.get('activity_level', 'No especificado'),
+        user_context.get('experience_level', 'No especificado'),
+        user_context.get('daily_calories', 'No calculado')
+    )
 
 async def generate_ai_response(user_message: str, user_context: dict) -> str:
     """Generate AI response using OpenAI"""
@@ -1057,30 +1324,102 @@ async def generate_ai_response(user_message: str, user_context: dict) -> str:
         return "AI chatbot no disponible. Por favor, configura tu clave API de OpenAI."
     
     try:
-        system_prompt = f"""
-        Eres un entrenador personal y nutricionista experto. El usuario tiene los siguientes datos:
-        - Objetivo: {user_context.get('goal', 'No especificado')}
-        - Nivel de actividad: {user_context.get('activity_level', 'No especificado')}
-        - Experiencia: {user_context.get('experience_level', 'No especificado')}
-        - Calorías diarias recomendadas: {user_context.get('daily_calories', 'No calculado')}
+        messages = [
+            {"role": "system", "content": build_chat_system_prompt(user_context)},
+            {"role": "user", "content": user_message}
+        ]
+        cache_key = ai_cache_key("gpt-4", messages)
+        cached = _ai_response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        Proporciona consejos útiles, motivación y respuestas personalizadas sobre fitness, nutrición y salud.
-        Mantén un tono amigable y profesional. Si no tienes información suficiente, pide más detalles.
-        """
+        response = await get_openai_client().chat.completions.create(
+            model="gpt-4",
+            messages=messages,
+            max_tokens=500,
+            temperature=0.7
+        )
         
-        response = openai.chat.completions.create(
+        ai_response = response.choices[0].message.content
+        _ai_response_cache.set(cache_key, ai_response)
+        return ai_response
+    except Exception as e:
+        return f"Error al generar respuesta: {str(e)}"
+
+async def stream_ai_response(user_message: str, user_context: dict):
+    """Yield AI response text deltas as OpenAI produces them"""
+    if not OPENAI_API_KEY:
+        yield "AI chatbot no disponible. Por favor, configura tu clave API de OpenAI."
+        return
+    
+    try:
+        stream = await get_openai_client().chat.completions.create(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": build_chat_system_prompt(user_context)},
                 {"role": "user", "content": user_message}
             ],
             max_tokens=500,
-            temperature=0.7
+            temperature=0.7,
+            stream=True
         )
         
-        return response.choices[0].message.content
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     except Exception as e:
-        return f"Error al generar respuesta: {str(e)}"
+        yield f"Error al generar respuesta: {str(e)}"
+
+# Nutrition plans come back as a forced function call, so the response shape is
+# declared once here instead of as a JSON example inside every prompt
+NUTRITION_PLAN_DAYS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+NUTRITION_PLAN_MEALS = ("Desayuno", "Almuerzo", "Merienda", "Cena")
+
+_PLANNED_MEAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "ingredients": {"type": "array", "items": {"type": "string"}},
+        "calories": {"type": "number"},
+        "protein": {"type": "number"},
+        "carbs": {"type": "number"},
+        "fat": {"type": "number"},
+        "instructions": {"type": "string"}
+    },
+    "required": ["name", "ingredients", "calories", "protein", "carbs", "fat", "instructions"]
+}
+
+_PLANNED_DAY_SCHEMA = {
+    "type": "object",
+    "properties": {meal: _PLANNED_MEAL_SCHEMA for meal in NUTRITION_PLAN_MEALS},
+    "required": list(NUTRITION_PLAN_MEALS)
+}
+
+NUTRITION_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "plan_name": {"type": "string"},
+        "total_calories": {"type": "number"},
+        "duration": {"type": "string"},
+        "days": {
+            "type": "object",
+            "properties": {day: _PLANNED_DAY_SCHEMA for day in NUTRITION_PLAN_DAYS},
+            "required": list(NUTRITION_PLAN_DAYS)
+        },
+        "tips": {"type": "array", "items": {"type": "string"}},
+        "shopping_list": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["plan_name", "total_calories", "duration", "days", "tips", "shopping_list"]
+}
+
+NUTRITION_PLAN_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_nutrition_plan",
+        "description": "Entrega el plan nutricional semanal generado",
+        "parameters": NUTRITION_PLAN_SCHEMA
+    }
+}
 
 async def generate_nutrition_plan_ai(user_evaluation, daily_calories: float) -> dict:
     """Generate AI-powered nutrition plan"""
@@ -1134,68 +1473,38 @@ async def generate_nutrition_plan_ai(user_evaluation, daily_calories: float) ->
         5. Ajusta las porciones según el objetivo (perder, mantener o ganar peso)
         6. Incluye consejos nutricionales específicos
         
-        FORMATO DE RESPUESTA (JSON):
-        {{
-            "plan_name": "Plan Nutricional Personalizado",
-            "total_calories": {daily_calories},
-            "duration": "7 días",
-            "days": {{
-                "Lunes": {{
-                    "Desayuno": {{
-                        "name": "Nombre del platillo",
-                        "ingredients": ["ingrediente1", "ingrediente2"],
-                        "calories": 450,
-                        "protein": 20,
-                        "carbs": 50,
-                        "fat": 15,
-                        "instructions": "Instrucciones de preparación"
-                    }},
-                    "Almuerzo": {{ ... }},
-                    "Merienda": {{ ... }},
-                    "Cena": {{ ... }}
-                }},
-                "Martes": {{ ... }},
-                ... (continúa para todos los días)
-            }},
-            "tips": [
-                "Consejo nutricional 1",
-                "Consejo nutricional 2",
-                "Consejo nutricional 3"
-            ],
-            "shopping_list": [
-                "Producto 1",
-                "Producto 2",
-                "Producto 3"
-            ]
-        }}
-        
-        Responde SOLO con el JSON válido, sin explicaciones adicionales.
+        Devuelve el plan llamando a la función emit_nutrition_plan.
         """
         
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Eres un nutricionista experto que crea planes alimentarios personalizados. Responde siempre en formato JSON válido."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=3000,
-            temperature=0.3
-        )
-        
-        # Parse the JSON response
-        ai_response = response.choices[0].message.content
-        
-        # Clean the response (remove any markdown formatting)
-        ai_response = ai_response.strip()
-        if ai_response.startswith('```json'):
-            ai_response = ai_response[7:]
-        if ai_response.endswith('```'):
-            ai_response = ai_response[:-3]
+        messages = [
+            {"role": "system", "content": "Eres un nutricionista experto que crea planes alimentarios personalizados."},
+            {"role": "user", "content": prompt}
+        ]
+        # Users with the same profile build the same prompt and share the plan
+        cache_key = ai_cache_key("gpt-4o", messages)
+        ai_response = _ai_response_cache.get(cache_key)
+        if ai_response is None:
+            response = await get_openai_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=3000,
+                temperature=0.3,
+                tools=[NUTRITION_PLAN_TOOL],
+                tool_choice={"type": "function", "function": {"name": "emit_nutrition_plan"}},
+                timeout=OPENAI_PLAN_TIMEOUT_SECONDS
+            )
+            
+            # The forced tool call carries the plan as JSON arguments
+            ai_response = response.choices[0].message.tool_calls[0].function.arguments
+            # Only text that parses is cached, and a hit doesn't restart its TTL
+            nutrition_plan = orjson.loads(ai_response)
+            _ai_response_cache.set(cache_key, ai_response)
+            return nutrition_plan
         
-        nutrition_plan = json.loads(ai_response)
-        return nutrition_plan
+        # Cache the text, not the dict, so callers get a fresh object to modify
+        return orjson.loads(ai_response)
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         return {"error": f"Error parsing AI response: {str(e)}"}
     except Exception as e:
         return {"error": f"Error generating nutrition plan: {str(e)}"}
@@ -1310,30 +1619,31 @@ async def generate_workout_plan_ai(user_evaluation: dict, user_id: str) -> dict:
         Responde SOLO con el JSON válido, sin explicaciones adicionales.
         """
         
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Eres un entrenador personal experto que crea planes de entrenamiento personalizados. Responde siempre en formato JSON válido."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=3000,
-            temperature=0.3
-        )
-        
-        # Parse the JSON response
-        ai_response = response.choices[0].message.content
-        
-        # Clean the response (remove any markdown formatting)
-        ai_response = ai_response.strip()
-        if ai_response.startswith('```json'):
-            ai_response = ai_response[7:]
-        if ai_response.endswith('```'):
-            ai_response = ai_response[:-3]
+        messages = [
+            {"role": "system", "content": "Eres un entrenador personal experto que crea planes de entrenamiento personalizados. Responde siempre en formato JSON válido."},
+            {"role": "user", "content": prompt}
+        ]
+        cache_key = ai_cache_key("gpt-4o", messages)
+        ai_response = _ai_response_cache.get(cache_key)
+        if ai_response is None:
+            response = await get_openai_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=3000,
+                temperature=0.3,
+                response_format={"type": "json_object"},
+                timeout=OPENAI_PLAN_TIMEOUT_SECONDS
+            )
+            
+            # JSON mode guarantees a bare JSON object, no markdown fences to strip
+            ai_response = response.choices[0].message.content
+            workout_plan = orjson.loads(ai_response)
+            _ai_response_cache.set(cache_key, ai_response)
+            return workout_plan
         
-        workout_plan = json.loads(ai_response)
-        return workout_plan
+        return orjson.loads(ai_response)
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         return {"error": f"Error parsing AI response: {str(e)}"}
     except Exception as e:
         return {"error": f"Error generating workout plan: {str(e)}"}
@@ -1394,28 +1704,38 @@ async def generate_meal_alternatives(original_meal: dict, user_preferences: list
         }}
         """
         
-        response = openai.chat.completions.create(
-            model="gpt-4",
+        response = await get_openai_client().chat.completions.create(
+            model="gpt-4o",
             messages=[
                 {"role": "system", "content": "Eres un chef nutricionista que crea alternativas de comidas saludables. Responde solo en JSON válido."},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=1000,
-            temperature=0.5
+            temperature=0.5,
+            response_format={"type": "json_object"}
         )
         
-        ai_response = response.choices[0].message.content.strip()
-        if ai_response.startswith('```json'):
-            ai_response = ai_response[7:]
-        if ai_response.endswith('```'):
-            ai_response = ai_response[:-3]
+        ai_response = response.choices[0].message.content
         
-        alternatives = json.loads(ai_response)
+        alternatives = orjson.loads(ai_response)
         return alternatives.get('alternatives', [])
         
     except Exception as e:
         return []
 
+# Cap on simultaneous OpenAI calls from one fan-out, to stay under the rate limit
+MEAL_ALTERNATIVES_CONCURRENCY = 8
+
+async def generate_meal_alternatives_bulk(meals: List[dict], user_preferences: list, allergies: list) -> List[list]:
+    """Generate alternatives for many meals concurrently, in the same order as meals"""
+    semaphore = asyncio.Semaphore(MEAL_ALTERNATIVES_CONCURRENCY)
+    
+    async def alternatives_for(meal: dict) -> list:
+        async with semaphore:
+            return await generate_meal_alternatives(meal, user_preferences, allergies)
+    
+    return await asyncio.gather(*(alternatives_for(meal) for meal in meals))
+
 # API Routes
 
 # Authentication
@@ -1427,14 +1747,15 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    # bcrypt is ~250ms of CPU; hash in a worker thread so the event loop keeps serving
+    hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
         hashed_password=hashed_password
     )
     
-    await db.users.insert_one(user.dict())
+    await db.users.insert_one(user.model_dump())
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -1447,7 +1768,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"email": user_data.email})
-    if not user or not verify_password(user_data.password, user["hashed_password"]):
+    if not user or not await run_in_threadpool(verify_password, user_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -1476,11 +1797,12 @@ async def update_evaluation(evaluation: UserEvaluation, current_user: User = Dep
     await db.users.update_one(
         {"id": current_user.id},
         {"$set": {
-            "evaluation": evaluation.dict(),
+            "evaluation": evaluation.model_dump(),
             "tmb": tmb,
             "daily_calories": daily_calories
         }}
     )
+    invalidate_cached_user(current_user.id)
     
     return {"message": "Evaluación actualizada exitosamente", "tmb": tmb, "daily_calories": daily_calories}
 
@@ -1489,7 +1811,8 @@ async def update_evaluation(evaluation: UserEvaluation, current_user: User = Dep
 async def get_exercises(
     type: Optional[ExerciseType] = None,
     difficulty: Optional[DifficultyLevel] = None,
-    muscle_group: Optional[str] = None
+    muscle_group: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
     query = {}
     if type:
@@ -1497,21 +1820,30 @@ async def get_exercises(
     if difficulty:
         query["difficulty"] = difficulty
     if muscle_group:
-        query["muscle_groups"] = {"$in": [muscle_group]}
+        query["muscle_groups"] = muscle_group
     
-    exercises = await db.exercises.find(query).to_list(100)
-    return [Exercise(**exercise) for exercise in exercises]
+    cache_key = (type, difficulty, muscle_group)
+    entry = _exercise_list_cache.get(cache_key)
+    if entry is None:
+        exercises = await db.exercises.find(query, {"_id": 0}).to_list(100)
+        entry = encode_catalog_list(_exercise_list_adapter, exercises)
+        _exercise_list_cache.set(cache_key, entry)
+    return catalog_response(entry, if_none_match)
 
 @api_router.post("/exercises", response_model=Exercise)
 async def create_exercise(exercise: Exercise, current_user: User = Depends(get_current_user)):
-    await db.exercises.insert_one(exercise.dict())
+    await db.exercises.insert_one({**exercise.model_dump(), "name_lc": exercise.name.lower()})
+    _exercise_list_cache.clear()
+    _exercise_stats_cache.clear()
     return exercise
 
 # Nutrition Plans
-@api_router.get("/nutrition-plans", response_model=List[NutritionPlan])
+@api_router.get("/nutrition-plans", response_model=List[NutritionPlanSummary])
 async def get_nutrition_plans(current_user: User = Depends(get_current_user)):
-    plans = await db.nutrition_plans.find({"user_id": current_user.id}).to_list(100)
-    return [NutritionPlan(**plan) for plan in plans]
+    # Newest first, served by the (user_id, created_at) index; ids of older plans are random UUID4s
+    return await db.nutrition_plans.find(
+        {"user_id": current_user.id}, NUTRITION_PLAN_SUMMARY_PROJECTION
+    ).sort("created_at", -1).to_list(100)
 
 @api_router.post("/nutrition-plans/generate")
 async def generate_nutrition_plan(current_user: User = Depends(get_current_user)):
@@ -1530,6 +1862,7 @@ async def generate_nutrition_plan(current_user: User = Depends(get_current_user)
         daily_meals = []
         for meal_type, meal_data in day_meals.items():
             meal = Meal(
+                id=new_id(),
                 name=meal_data.get("name", ""),
                 foods=[],  # We'll populate this with actual food IDs later
                 total_calories=meal_data.get("calories", 0),
@@ -1537,7 +1870,8 @@ async def generate_nutrition_plan(current_user: User = Depends(get_current_user)
                 total_carbs=meal_data.get("carbs", 0),
                 total_fat=meal_data.get("fat", 0),
                 meal_type=meal_type.lower(),
-                instructions=meal_data.get("instructions", "")
+                instructions=meal_data.get("instructions", ""),
+                ingredients=meal_data.get("ingredients", [])
             )
             daily_meals.append(meal)
         meals_by_day[day] = daily_meals
@@ -1547,10 +1881,15 @@ async def generate_nutrition_plan(current_user: User = Depends(get_current_user)
         user_id=current_user.id,
         week_number=1,
         daily_calories=current_user.daily_calories,
-        meals={day: [meal.dict() for meal in meals] for day, meals in meals_by_day.items()}
+        meals=meals_by_day,
+        tips=ai_plan.get("tips", []),
+        shopping_list=ai_plan.get("shopping_list", [])
     )
     
-    await db.nutrition_plans.insert_one(plan.dict())
+    # Plans are not edited after generation, so the analysis is computed once here
+    plan_doc = plan.model_dump()
+    plan_doc["precomputed_analysis"] = compute_nutrition_analysis(plan_doc["meals"], plan.daily_calories)
+    await db.nutrition_plans.insert_one(plan_doc)
     
     # Return the AI-generated plan with additional info
     return {
@@ -1561,13 +1900,13 @@ async def generate_nutrition_plan(current_user: User = Depends(get_current_user)
         "shopping_list": ai_plan.get("shopping_list", [])
     }
 
-@api_router.get("/nutrition-plans/{plan_id}")
+@api_router.get("/nutrition-plans/{plan_id}", response_model=NutritionPlan)
 async def get_nutrition_plan_details(plan_id: str, current_user: User = Depends(get_current_user)):
-    plan = await db.nutrition_plans.find_one({"id": plan_id, "user_id": current_user.id})
+    plan = await db.nutrition_plans.find_one({"id": plan_id, "user_id": current_user.id}, {"_id": 0})
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
-    return NutritionPlan(**plan)
+    return plan
 
 @api_router.post("/nutrition-plans/{plan_id}/alternatives")
 async def get_meal_alternatives(
@@ -1603,37 +1942,91 @@ async def get_meal_alternatives(
         "alternatives": alternatives
     }
 
+@api_router.post("/nutrition-plans/{plan_id}/alternatives/all")
+async def get_all_meal_alternatives(
+    plan_id: str,
+    day: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Alternatives for every meal of the plan (or of one day) in a single request"""
+    plan = await db.nutrition_plans.find_one({"id": plan_id, "user_id": current_user.id}, {"_id": 0, "meals": 1})
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    plan_meals = plan.get("meals", {})
+    if day is not None:
+        if day not in plan_meals:
+            raise HTTPException(status_code=404, detail="Day not found")
+        plan_meals = {day: plan_meals[day]}
+    
+    targets = [
+        (meal_day, meal)
+        for meal_day, day_meals in plan_meals.items()
+        for meal in day_meals
+        if isinstance(meal, dict)
+    ]
+    
+    user_preferences = current_user.evaluation.food_preferences if current_user.evaluation else []
+    user_allergies = current_user.evaluation.food_allergies if current_user.evaluation else []
+    
+    # One OpenAI round trip of wall-clock time instead of one per meal
+    results = await generate_meal_alternatives_bulk([meal for _, meal in targets], user_preferences, user_allergies)
+    
+    return {
+        "alternatives": [
+            {
+                "day": meal_day,
+                "meal_type": meal.get("meal_type"),
+                "original_meal": meal,
+                "alternatives": alternatives
+            }
+            for (meal_day, meal), alternatives in zip(targets, results)
+        ]
+    }
+
 # Shopping Lists
 @api_router.post("/shopping-lists/generate/{plan_id}")
 async def generate_shopping_list(plan_id: str, current_user: User = Depends(get_current_user)):
     # Get the nutrition plan
-    plan = await db.nutrition_plans.find_one({"id": plan_id, "user_id": current_user.id})
+    plan = await db.nutrition_plans.find_one(
+        {"id": plan_id, "user_id": current_user.id},
+        {"_id": 0, "meals": 1, "shopping_list": 1}
+    )
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
-    # Extract ingredients from all meals
-    all_ingredients = []
-    for day, meals in plan.get("meals", {}).items():
-        for meal in meals:
-            if isinstance(meal, dict) and "name" in meal:
-                # This is a simplified approach - in a real app, you'd parse ingredients more carefully
-                meal_name = meal.get("name", "")
-                all_ingredients.append(f"Ingredientes para {meal_name}")
-    
-    # Get shopping list from the plan if available
+    # Prefer the plan's own shopping list; otherwise collect every meal's ingredients
     shopping_items = plan.get("shopping_list", [])
     if not shopping_items:
-        shopping_items = all_ingredients
+        meals = [
+            meal
+            for day_meals in plan.get("meals", {}).values()
+            for meal in day_meals
+            if isinstance(meal, dict)
+        ]
+        shopping_items = [ingredient for meal in meals for ingredient in meal.get("ingredients", [])]
+        if not shopping_items:
+            shopping_items = [f"Ingredientes para {meal['name']}" for meal in meals if "name" in meal]
     
-    # Create shopping list items with categories
-    categorized_items = []
+    # One line per distinct item (case-insensitive); quantity is how often it's needed
+    counts = Counter()
+    display_names = {}
     for item in shopping_items:
-        categorized_items.append({
-            "name": item,
-            "quantity": "1",
-            "category": "General",
+        key = item.strip().lower()
+        if key:
+            counts[key] += 1
+            display_names.setdefault(key, item.strip())
+    
+    # Create shopping list items with categories
+    categorized_items = [
+        {
+            "name": display_names[key],
+            "quantity": str(count),
+            "category": categorize_ingredient(key),
             "purchased": False
-        })
+        }
+        for key, count in counts.items()
+    ]
     
     # Create shopping list
     shopping_list = ShoppingList(
@@ -1642,7 +2035,7 @@ async def generate_shopping_list(plan_id: str, current_user: User = Depends(get_
         items=categorized_items
     )
     
-    await db.shopping_lists.insert_one(shopping_list.dict())
+    await db.shopping_lists.insert_one(shopping_list.model_dump())
     
     return {
         "message": "Lista de compras generada exitosamente",
@@ -1650,10 +2043,9 @@ async def generate_shopping_list(plan_id: str, current_user: User = Depends(get_
         "items": categorized_items
     }
 
-@api_router.get("/shopping-lists")
+@api_router.get("/shopping-lists", response_model=List[ShoppingList])
 async def get_shopping_lists(current_user: User = Depends(get_current_user)):
-    lists = await db.shopping_lists.find({"user_id": current_user.id}).to_list(100)
-    return [ShoppingList(**shopping_list) for shopping_list in lists]
+    return await db.shopping_lists.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
 
 @api_router.put("/shopping-lists/{list_id}/items/{item_index}")
 async def update_shopping_item(
@@ -1662,33 +2054,44 @@ async def update_shopping_item(
     purchased: bool,
     current_user: User = Depends(get_current_user)
 ):
-    # Get the shopping list
-    shopping_list = await db.shopping_lists.find_one({"id": list_id, "user_id": current_user.id})
-    if not shopping_list:
-        raise HTTPException(status_code=404, detail="Shopping list not found")
-    
-    # Update the item
-    items = shopping_list.get("items", [])
-    if 0 <= item_index < len(items):
-        items[item_index]["purchased"] = purchased
-        
-        # Update the shopping list
-        await db.shopping_lists.update_one(
-            {"id": list_id, "user_id": current_user.id},
-            {"$set": {"items": items}}
+    # Set the single field in place; concurrent updates to other items can't be lost
+    if item_index >= 0:
+        result = await db.shopping_lists.update_one(
+            {"id": list_id, "user_id": current_user.id, f"items.{item_index}": {"$exists": True}},
+            {"$set": {f"items.{item_index}.purchased": purchased}}
         )
-        
-        return {"message": "Item actualizado exitosamente"}
-    else:
-        raise HTTPException(status_code=404, detail="Item not found")
+        if result.matched_count:
+            return {"message": "Item actualizado exitosamente"}
+    
+    # Nothing matched: tell a missing list apart from a missing item
+    if not await db.shopping_lists.find_one({"id": list_id, "user_id": current_user.id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    raise HTTPException(status_code=404, detail="Item not found")
 
 # Nutritional Analysis
-@api_router.get("/nutrition-analysis/{plan_id}")
-async def get_nutrition_analysis(plan_id: str, current_user: User = Depends(get_current_user)):
-    plan = await db.nutrition_plans.find_one({"id": plan_id, "user_id": current_user.id})
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    
+# Only the per-meal totals and meal_type of every day; names, ingredients and instructions stay in Mongo
+NUTRITION_ANALYSIS_PROJECTION = {
+    "_id": 0,
+    "daily_calories": 1,
+    "meals": {"$arrayToObject": {"$map": {
+        "input": {"$objectToArray": "$meals"},
+        "as": "day",
+        "in": {"k": "$$day.k", "v": {"$map": {
+            "input": "$$day.v",
+            "as": "meal",
+            "in": {
+                "total_calories": "$$meal.total_calories",
+                "total_protein": "$$meal.total_protein",
+                "total_carbs": "$$meal.total_carbs",
+                "total_fat": "$$meal.total_fat",
+                "meal_type": "$$meal.meal_type",
+            },
+        }}},
+    }}},
+}
+
+def compute_nutrition_analysis(meals_by_day: Dict[str, List[Any]], target_calories: float) -> dict:
+    """Weekly macro summary of a plan; stored on the plan as precomputed_analysis"""
     # Calculate weekly nutritional summary
     weekly_calories = 0
     weekly_protein = 0
@@ -1698,7 +2101,7 @@ async def get_nutrition_analysis(plan_id: str, current_user: User = Depends(get_
     daily_averages = {}
     meal_distribution = {"desayuno": 0, "almuerzo": 0, "merienda": 0, "cena": 0}
     
-    for day, meals in plan.get("meals", {}).items():
+    for day, meals in meals_by_day.items():
         daily_calories = 0
         daily_protein = 0
         daily_carbs = 0
@@ -1752,7 +2155,6 @@ async def get_nutrition_analysis(plan_id: str, current_user: User = Depends(get_
         protein_percentage = carbs_percentage = fat_percentage = 0
     
     return {
-        "plan_id": plan_id,
         "weekly_summary": {
             "total_calories": weekly_calories,
             "total_protein": weekly_protein,
@@ -1772,16 +2174,44 @@ async def get_nutrition_analysis(plan_id: str, current_user: User = Depends(get_
         },
         "meal_distribution": meal_distribution,
         "daily_breakdown": daily_averages,
-        "target_calories": plan.get("daily_calories", 0),
-        "calorie_variance": round(avg_calories - plan.get("daily_calories", 0), 2)
+        "target_calories": target_calories,
+        "calorie_variance": round(avg_calories - target_calories, 2)
     }
 
-# Workout Plans
-@api_router.get("/workout-plans", response_model=List[WorkoutPlan])
-async def get_workout_plans(current_user: User = Depends(get_current_user)):
-    plans = await db.workout_plans.find({"user_id": current_user.id}).to_list(100)
-    return [WorkoutPlan(**plan) for plan in plans]
-
+@api_router.get("/nutrition-analysis/{plan_id}")
+async def get_nutrition_analysis(plan_id: str, current_user: User = Depends(get_current_user)):
+    plan = await db.nutrition_plans.find_one(
+        {"id": plan_id, "user_id": current_user.id},
+        {"_id": 0, "precomputed_analysis": 1}
+    )
+    # Older plans project to an empty (but existing) document
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    analysis = plan.get("precomputed_analysis")
+    if analysis is None:
+        # Plans created before the analysis was stored: compute it once and keep it
+        cursor = await db.nutrition_plans.aggregate([
+            {"$match": {"id": plan_id, "user_id": current_user.id}},
+            {"$project": NUTRITION_ANALYSIS_PROJECTION},
+        ])
+        plan = (await cursor.to_list(1))[0]
+        analysis = compute_nutrition_analysis(plan.get("meals") or {}, plan.get("daily_calories", 0))
+        await db.nutrition_plans.update_one(
+            {"id": plan_id, "user_id": current_user.id},
+            {"$set": {"precomputed_analysis": analysis}}
+        )
+    
+    # Plain numbers and strings: hand them straight to orjson, skipping jsonable_encoder
+    return ORJSONResponse({"plan_id": plan_id, **analysis})
+
+# Workout Plans
+@api_router.get("/workout-plans", response_model=List[WorkoutPlanSummary])
+async def get_workout_plans(current_user: User = Depends(get_current_user)):
+    return await db.workout_plans.find(
+        {"user_id": current_user.id}, WORKOUT_PLAN_SUMMARY_PROJECTION
+    ).sort("created_at", -1).to_list(100)
+
 @api_router.post("/workout-plans/generate")
 async def generate_workout_plan(current_user: User = Depends(get_current_user)):
     if not current_user.evaluation:
@@ -1798,6 +2228,7 @@ async def generate_workout_plan(current_user: User = Depends(get_current_user)):
     for day, workout_data in ai_plan.get("workouts", {}).items():
         if workout_data:  # Only add if there's actually a workout for this day
             workout_session = WorkoutSession(
+                id=new_id(),
                 name=workout_data.get("name", f"Entrenamiento {day}"),
                 exercises=workout_data.get("exercises", []),
                 total_duration=workout_data.get("duration", 60),
@@ -1810,10 +2241,10 @@ async def generate_workout_plan(current_user: User = Depends(get_current_user)):
     plan = WorkoutPlan(
         user_id=current_user.id,
         week_number=1,
-        sessions={day: session.dict() for day, session in sessions_by_day.items()}
+        sessions=sessions_by_day
     )
     
-    await db.workout_plans.insert_one(plan.dict())
+    await db.workout_plans.insert_one(plan.model_dump())
     
     return {
         "message": "Plan de entrenamiento generado exitosamente",
@@ -1827,13 +2258,21 @@ async def generate_workout_plan(current_user: User = Depends(get_current_user)):
 @api_router.post("/progress", response_model=ProgressEntry)
 async def add_progress_entry(entry: ProgressEntry, current_user: User = Depends(get_current_user)):
     entry.user_id = current_user.id
-    await db.progress.insert_one(entry.dict())
+    await db.progress.insert_one(entry.model_dump())
     return entry
 
-@api_router.get("/progress", response_model=List[ProgressEntry])
+@api_router.get("/progress", response_model=List[ProgressSummary])
 async def get_progress(current_user: User = Depends(get_current_user)):
-    entries = await db.progress.find({"user_id": current_user.id}).sort("date", -1).to_list(100)
-    return [ProgressEntry(**entry) for entry in entries]
+    # Photos are base64 blobs and the history view never renders them; keep them off the wire
+    return await db.progress.find({"user_id": current_user.id}, {"_id": 0, "photos": 0}).sort("date", -1).to_list(100)
+
+@api_router.get("/progress/{entry_id}", response_model=ProgressEntry)
+async def get_progress_entry(entry_id: str, current_user: User = Depends(get_current_user)):
+    entry = await db.progress.find_one({"id": entry_id, "user_id": current_user.id}, {"_id": 0})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Progress entry not found")
+    
+    return entry
 
 # Water Intake
 @api_router.post("/water-intake", response_model=WaterIntake)
@@ -1843,7 +2282,7 @@ async def add_water_intake(intake_request: WaterIntakeRequest, current_user: Use
         amount_ml=intake_request.amount_ml,
         goal_ml=intake_request.goal_ml
     )
-    await db.water_intake.insert_one(intake.dict())
+    await db.water_intake.insert_one(intake.model_dump())
     return intake
 
 @api_router.get("/water-intake/today")
@@ -1851,20 +2290,29 @@ async def get_today_water_intake(current_user: User = Depends(get_current_user))
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     tomorrow = today + timedelta(days=1)
     
-    entries = await db.water_intake.find({
-        "user_id": current_user.id,
-        "date": {"$gte": today, "$lt": tomorrow}
-    }).to_list(100)
-    
-    # Convert entries to proper format, excluding MongoDB _id field
-    clean_entries = []
-    for entry in entries:
-        if "_id" in entry:
-            del entry["_id"]
-        clean_entries.append(entry)
+    # Let MongoDB sum the day's intake; only the entry fields the tracker shows leave the server
+    pipeline = [
+        {"$match": {"user_id": current_user.id, "date": {"$gte": today, "$lt": tomorrow}}},
+        {"$sort": {"date": 1}},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": "$amount_ml"},
+            "entries": {"$push": {
+                "id": "$id",
+                "user_id": "$user_id",
+                "date": "$date",
+                "amount_ml": "$amount_ml",
+                "goal_ml": "$goal_ml"
+            }}
+        }}
+    ]
+    cursor = await db.water_intake.aggregate(pipeline)
+    result = await cursor.to_list(1)
     
-    total_intake = sum(entry["amount_ml"] for entry in clean_entries)
-    return {"total_intake": total_intake, "goal": 2000, "entries": clean_entries}
+    total_intake = result[0]["total"] if result else 0
+    entries = result[0]["entries"] if result else []
+    # Plain dicts of primitives/datetimes: hand them straight to orjson, skipping jsonable_encoder
+    return ORJSONResponse({"total_intake": total_intake, "goal": 2000, "entries": entries})
 
 # Advanced Exercise Library
 @api_router.post("/exercises/search")
@@ -1875,31 +2323,37 @@ async def search_exercises(filters: ExerciseFilter):
         query = build_exercise_query(filters)
         
         # Build sort criteria
-        sort_criteria = []
         if filters.sort_by == "rating":
-            sort_criteria.append(("rating", -1 if filters.sort_order == "desc" else 1))
+            sort_criteria = {"rating": -1 if filters.sort_order == "desc" else 1}
         elif filters.sort_by == "calories":
-            sort_criteria.append(("calories_burned", -1 if filters.sort_order == "desc" else 1))
+            sort_criteria = {"calories_burned": -1 if filters.sort_order == "desc" else 1}
         elif filters.sort_by == "difficulty":
-            sort_criteria.append(("difficulty", -1 if filters.sort_order == "desc" else 1))
+            sort_criteria = {"difficulty": -1 if filters.sort_order == "desc" else 1}
         else:
-            sort_criteria.append(("name", 1))
-        
-        # Execute query
-        cursor = db.exercises.find(query)
-        if sort_criteria:
-            cursor = cursor.sort(sort_criteria)
+            sort_criteria = {"name": 1}
         
-        cursor = cursor.skip(filters.offset or 0).limit(filters.limit or 50)
-        exercises = await cursor.to_list(length=filters.limit or 50)
-        
-        # Get total count
-        total_count = await db.exercises.count_documents(query)
+        # Page and total count from one match, in one round trip
+        pipeline = [
+            {"$match": query},
+            {"$facet": {
+                "exercises": [
+                    {"$sort": sort_criteria},
+                    {"$skip": filters.offset or 0},
+                    {"$limit": filters.limit or 50},
+                    {"$project": CATALOG_PUBLIC_PROJECTION}
+                ],
+                "total": [{"$count": "count"}]
+            }}
+        ]
+        cursor = await db.exercises.aggregate(pipeline)
+        result = (await cursor.to_list(1))[0]
+        exercises = result["exercises"]
+        total_count = result["total"][0]["count"] if result["total"] else 0
         
         return {
             "exercises": exercises,
             "total_count": total_count,
-            "filters_applied": filters.dict(),
+            "filters_applied": filters.model_dump(),
             "pagination": {
                 "offset": filters.offset or 0,
                 "limit": filters.limit or 50,
@@ -1913,23 +2367,31 @@ async def search_exercises(filters: ExerciseFilter):
 @api_router.get("/exercises/{exercise_id}")
 async def get_exercise_details(exercise_id: str):
     """Get detailed information about a specific exercise"""
-    exercise = await db.exercises.find_one({"id": exercise_id})
+    exercise = await db.exercises.find_one({"id": exercise_id}, CATALOG_PUBLIC_PROJECTION)
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    # Get reviews for this exercise
-    reviews = await db.exercise_reviews.find({"exercise_id": exercise_id}).to_list(100)
+    # Rating stats over every review, plus the first 10 to display, in one round trip
+    pipeline = [
+        {"$match": {"exercise_id": exercise_id}},
+        {"$facet": {
+            "stats": [{"$group": {"_id": None, "avg_rating": {"$avg": "$rating"}, "count": {"$sum": 1}}}],
+            "reviews": [{"$limit": 10}, {"$project": {"_id": 0}}]
+        }}
+    ]
+    cursor = await db.exercise_reviews.aggregate(pipeline)
+    result = (await cursor.to_list(1))[0]
+    stats = result["stats"][0] if result["stats"] else {"count": 0}
     
     # Calculate average rating
-    if reviews:
-        avg_rating = sum(review["rating"] for review in reviews) / len(reviews)
-        exercise["rating"] = round(avg_rating, 1)
-        exercise["review_count"] = len(reviews)
+    if stats["count"]:
+        exercise["rating"] = round(stats["avg_rating"], 1)
+        exercise["review_count"] = stats["count"]
     
     return {
         "exercise": exercise,
-        "reviews": reviews[:10],  # Return first 10 reviews
-        "total_reviews": len(reviews)
+        "reviews": result["reviews"],
+        "total_reviews": stats["count"]
     }
 
 @api_router.post("/exercises/{exercise_id}/review")
@@ -1944,37 +2406,35 @@ async def add_exercise_review(
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
     
     # Check if exercise exists
-    exercise = await db.exercises.find_one({"id": exercise_id})
+    exercise = await db.exercises.find_one({"id": exercise_id}, {"_id": 1})
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    # Check if user already reviewed this exercise
-    existing_review = await db.exercise_reviews.find_one({
-        "exercise_id": exercise_id,
-        "user_id": current_user.id
-    })
-    
-    if existing_review:
-        # Update existing review
-        await db.exercise_reviews.update_one(
-            {"exercise_id": exercise_id, "user_id": current_user.id},
-            {"$set": {"rating": rating, "comment": comment}}
-        )
-    else:
-        # Create new review
-        review = ExerciseReview(
-            exercise_id=exercise_id,
-            user_id=current_user.id,
-            rating=rating,
-            comment=comment
-        )
-        await db.exercise_reviews.insert_one(review.dict())
+    # Update the user's existing review, or create it, in one atomic upsert
+    review = ExerciseReview(
+        exercise_id=exercise_id,
+        user_id=current_user.id,
+        rating=rating,
+        comment=comment
+    )
+    await db.exercise_reviews.update_one(
+        {"exercise_id": exercise_id, "user_id": current_user.id},
+        {
+            "$set": {"rating": review.rating, "comment": review.comment},
+            "$setOnInsert": {"id": review.id, "created_at": review.created_at}
+        },
+        upsert=True
+    )
     
     return {"message": "Review added successfully"}
 
 @api_router.get("/exercises/categories/stats")
 async def get_exercise_categories_stats():
     """Get statistics about exercise categories"""
+    cached = _exercise_stats_cache.get("stats")
+    if cached is not None:
+        return cached
+    
     try:
         pipeline = [
             {
@@ -1988,7 +2448,8 @@ async def get_exercise_categories_stats():
             }
         ]
         
-        stats = await db.exercises.aggregate(pipeline).to_list(100)
+        cursor = await db.exercises.aggregate(pipeline)
+        stats = await cursor.to_list(100)
         
         # Convert to expected format
         categories = {}
@@ -2000,21 +2461,47 @@ async def get_exercise_categories_stats():
                 "avg_rating": stat["avg_rating"]
             }
         
-        return {
+        result = {
             "categories": categories,
             "total_exercises": sum(stat["count"] for stat in stats)
         }
+        _exercise_stats_cache.set("stats", result)
+        return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting exercise stats: {str(e)}")
 
 # Food Comparison Tool
+# Fields read by compare_foods, either directly or through calculate_food_health_score
+FOOD_COMPARISON_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in (
+        "id", "name", "serving_size", "calories_per_100g", "protein", "carbs", "fat",
+        "fiber", "sugar", "sodium", "saturated_fat", "calcium", "iron", "vitamin_c"
+    )}
+}
+
+# Nutrient fields scaled per serving; optional ones default to 0 like the old food.get(field, 0)
+COMPARISON_NUTRIENTS = (
+    "calories_per_100g", "protein", "carbs", "fat", "fiber", "sugar", "sodium",
+    "saturated_fat", "calcium", "iron", "vitamin_c"
+)
+LABEL_NUTRIENTS = COMPARISON_NUTRIENTS + ("vitamin_a", "potassium", "trans_fat", "cholesterol")
+NUTRIENT_DEFAULTS = dict.fromkeys(LABEL_NUTRIENTS, 0)
+_comparison_nutrients_getter = itemgetter(*COMPARISON_NUTRIENTS)
+_label_nutrients_getter = itemgetter(*LABEL_NUTRIENTS)
+
+def scale_nutrients(food: Mapping[str, Any], fields: tuple, getter: itemgetter, multiplier: float) -> Dict[str, float]:
+    """Read all of `fields` in one itemgetter call and scale them to the serving"""
+    values = getter({**NUTRIENT_DEFAULTS, **food})
+    return {field: round(value * multiplier, 1) for field, value in zip(fields, values)}
+
 @api_router.post("/foods/compare")
 async def compare_foods(comparison: FoodComparison):
     """Compare nutritional values of multiple foods"""
     try:
         # Get food data
-        foods = await db.foods.find({"id": {"$in": comparison.foods}}).to_list(100)
+        foods = await db.foods.find({"id": {"$in": comparison.foods}}, FOOD_COMPARISON_PROJECTION).to_list(100)
         
         if len(foods) < 2:
             raise HTTPException(status_code=400, detail="Need at least 2 foods to compare")
@@ -2023,23 +2510,15 @@ async def compare_foods(comparison: FoodComparison):
         comparison_data = []
         for food in foods:
             serving_multiplier = comparison.serving_size / food.get("serving_size", 100)
+            scaled = scale_nutrients(food, COMPARISON_NUTRIENTS, _comparison_nutrients_getter, serving_multiplier)
             
             nutritional_data = {
                 "id": food["id"],
                 "name": food["name"],
                 "serving_size": comparison.serving_size,
-                "calories": round(food["calories_per_100g"] * serving_multiplier, 1),
-                "protein": round(food["protein"] * serving_multiplier, 1),
-                "carbs": round(food["carbs"] * serving_multiplier, 1),
-                "fat": round(food["fat"] * serving_multiplier, 1),
-                "fiber": round(food["fiber"] * serving_multiplier, 1),
-                "sugar": round(food["sugar"] * serving_multiplier, 1),
-                "sodium": round(food["sodium"] * serving_multiplier, 1),
-                "saturated_fat": round(food.get("saturated_fat", 0) * serving_multiplier, 1),
-                "calcium": round(food.get("calcium", 0) * serving_multiplier, 1),
-                "iron": round(food.get("iron", 0) * serving_multiplier, 1),
-                "vitamin_c": round(food.get("vitamin_c", 0) * serving_multiplier, 1),
-                "health_score": calculate_food_health_score(food)
+                "calories": scaled.pop("calories_per_100g"),
+                **scaled,
+                "health_score": food_health_score(food)
             }
             
             comparison_data.append(nutritional_data)
@@ -2047,12 +2526,12 @@ async def compare_foods(comparison: FoodComparison):
         # Generate comparison insights
         insights = generate_food_comparison_insights(comparison_data)
         
-        return {
+        return ORJSONResponse({
             "comparison_data": comparison_data,
             "insights": insights,
             "serving_size": comparison.serving_size,
             "comparison_type": comparison.comparison_type
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error comparing foods: {str(e)}")
@@ -2071,7 +2550,7 @@ async def search_foods(
         query = {}
         
         if q:
-            query["name"] = {"$regex": q, "$options": "i"}
+            query.update(name_prefix_match(q))
         
         if category:
             query["category"] = category
@@ -2084,13 +2563,13 @@ async def search_foods(
         
         if dietary_flags:
             flags = dietary_flags.split(",")
-            query["dietary_flags"] = {"$in": flags}
+            query["dietary_flags"] = match_any(flags)
         
-        foods = await db.foods.find(query).limit(limit).to_list(limit)
+        foods = await db.foods.find(query, CATALOG_PUBLIC_PROJECTION).limit(limit).to_list(limit)
         
         # Calculate health scores
         for food in foods:
-            food["health_score"] = calculate_food_health_score(food)
+            food["health_score"] = food_health_score(food)
         
         return {
             "foods": foods,
@@ -2110,33 +2589,23 @@ async def get_nutrition_label(food_id: str, serving_size: float = 100):
             raise HTTPException(status_code=404, detail="Food not found")
         
         serving_multiplier = serving_size / food.get("serving_size", 100)
+        scaled = scale_nutrients(food, LABEL_NUTRIENTS, _label_nutrients_getter, serving_multiplier)
         
         nutritional_data = {
             "serving_size": serving_size,
-            "calories": round(food["calories_per_100g"] * serving_multiplier, 1),
+            "calories": scaled["calories_per_100g"],
             "macronutrients": {
-                "protein": round(food["protein"] * serving_multiplier, 1),
-                "carbs": round(food["carbs"] * serving_multiplier, 1),
-                "fat": round(food["fat"] * serving_multiplier, 1),
-                "fiber": round(food["fiber"] * serving_multiplier, 1),
-                "sugar": round(food["sugar"] * serving_multiplier, 1)
+                field: scaled[field] for field in ("protein", "carbs", "fat", "fiber", "sugar")
             },
             "micronutrients": {
-                "sodium": round(food["sodium"] * serving_multiplier, 1),
-                "calcium": round(food.get("calcium", 0) * serving_multiplier, 1),
-                "iron": round(food.get("iron", 0) * serving_multiplier, 1),
-                "vitamin_c": round(food.get("vitamin_c", 0) * serving_multiplier, 1),
-                "vitamin_a": round(food.get("vitamin_a", 0) * serving_multiplier, 1),
-                "potassium": round(food.get("potassium", 0) * serving_multiplier, 1)
+                field: scaled[field] for field in ("sodium", "calcium", "iron", "vitamin_c", "vitamin_a", "potassium")
             },
             "fats": {
-                "saturated_fat": round(food.get("saturated_fat", 0) * serving_multiplier, 1),
-                "trans_fat": round(food.get("trans_fat", 0) * serving_multiplier, 1),
-                "cholesterol": round(food.get("cholesterol", 0) * serving_multiplier, 1)
+                field: scaled[field] for field in ("saturated_fat", "trans_fat", "cholesterol")
             }
         }
         
-        health_score = calculate_food_health_score(food)
+        health_score = food_health_score(food)
         
         # Generate recommendations
         recommendations = []
@@ -2156,14 +2625,14 @@ async def get_nutrition_label(food_id: str, serving_size: float = 100):
         if food["sodium"] >= 400:
             recommendations.append("Alto contenido de sodio")
         
-        return {
+        return ORJSONResponse({
             "food_name": food["name"],
             "nutritional_data": nutritional_data,
             "health_score": health_score,
             "recommendations": recommendations,
             "dietary_flags": food.get("dietary_flags", []),
             "allergens": food.get("allergens", [])
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating nutrition label: {str(e)}")
@@ -2182,7 +2651,7 @@ async def generate_smart_shopping_list_from_plan(
             raise HTTPException(status_code=404, detail="Nutrition plan not found")
         
         # Get user preferences
-        user_preferences = current_user.evaluation.dict() if current_user.evaluation else {}
+        user_preferences = current_user.evaluation_dict
         
         # Generate smart shopping list
         shopping_data = generate_smart_shopping_list(plan, user_preferences)
@@ -2197,7 +2666,7 @@ async def generate_smart_shopping_list_from_plan(
             categories=shopping_data["categories"]
         )
         
-        await db.shopping_lists.insert_one(shopping_list.dict())
+        await db.shopping_lists.insert_one(shopping_list.model_dump())
         
         return {
             "message": "Lista de compras inteligente generada exitosamente",
@@ -2282,15 +2751,21 @@ async def get_supplement_recommendations(current_user: User = Depends(get_curren
         )
         
         # Save recommendations to database
-        for rec in recommendations:
-            supplement_rec = SupplementRecommendation(
+        # One timestamp and one round trip for the whole batch
+        now = datetime.utcnow()
+        supplement_recs = [
+            SupplementRecommendation(
                 user_id=current_user.id,
                 supplement_id=rec["name"],  # In a real app, this would be a proper ID
                 reason=rec["reason"],
                 priority=rec["priority"],
-                confidence=rec["confidence"]
-            )
-            await db.supplement_recommendations.insert_one(supplement_rec.dict())
+                confidence=rec["confidence"],
+                created_at=now
+            ).model_dump()
+            for rec in recommendations
+        ]
+        if supplement_recs:
+            await db.supplement_recommendations.insert_many(supplement_recs)
         
         return {
             "recommendations": recommendations,
@@ -2319,20 +2794,20 @@ async def search_supplements(
         query = {}
         
         if q:
-            query["name"] = {"$regex": q, "$options": "i"}
+            query.update(name_prefix_match(q))
         
         if category:
             query["category"] = category
         
         if goal:
-            query["suitable_for"] = {"$in": [goal]}
+            query["suitable_for"] = goal
         
         if price_range:
             price_min, price_max = map(float, price_range.split("-"))
             query["price_range.min"] = {"$gte": price_min}
             query["price_range.max"] = {"$lte": price_max}
         
-        supplements = await db.supplements.find(query).limit(limit).to_list(limit)
+        supplements = await db.supplements.find(query, CATALOG_PUBLIC_PROJECTION).limit(limit).to_list(limit)
         
         return {
             "supplements": supplements,
@@ -2346,12 +2821,25 @@ async def search_supplements(
 @api_router.get("/supplements/{supplement_id}")
 async def get_supplement_details(supplement_id: str):
     """Get detailed information about a specific supplement"""
-    supplement = await db.supplements.find_one({"id": supplement_id})
-    if not supplement:
+    # The supplement and its reviews in one round trip; no match means it doesn't exist
+    pipeline = [
+        {"$match": {"id": supplement_id}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "supplement_reviews",
+            "localField": "id",
+            "foreignField": "supplement_id",
+            "as": "reviews"
+        }},
+        {"$project": {**CATALOG_PUBLIC_PROJECTION, "reviews._id": 0}}
+    ]
+    cursor = await db.supplements.aggregate(pipeline)
+    result = await cursor.to_list(1)
+    if not result:
         raise HTTPException(status_code=404, detail="Supplement not found")
     
-    # Get user reviews/ratings if available
-    reviews = await db.supplement_reviews.find({"supplement_id": supplement_id}).to_list(100)
+    supplement = result[0]
+    reviews = supplement.pop("reviews")
     
     return {
         "supplement": supplement,
@@ -2449,7 +2937,7 @@ async def calculate_health_metrics(
         )
         
         # Save to database
-        await db.health_metrics.insert_one(health_metrics.dict())
+        await db.health_metrics.insert_one(health_metrics.model_dump())
         
         return {
             "message": "Métricas de salud calculadas exitosamente",
@@ -2458,8 +2946,12 @@ async def calculate_health_metrics(
                 "bmi_category": bmi_category,
                 "body_fat_percentage": round(body_fat, 1),
                 "body_fat_navy": round(body_fat_navy, 1) if body_fat_navy else None,
-                "ideal_weight": ideal_weight,
-                "calorie_needs": calorie_needs,
+                # ideal_weight and calorie_needs keep their original {min, max} and
+                # Harris-Benedict TDEE shapes; the fuller breakdowns ride alongside
+                "ideal_weight": ideal_weight["bmi_range"],
+                "ideal_weight_formulas": ideal_weight,
+                "calorie_needs": calorie_needs["tdee_harris"],
+                "calorie_needs_detail": calorie_needs,
                 "health_status": health_metrics.health_status,
                 "recommendations": recommendations
             }
@@ -2473,14 +2965,10 @@ async def get_health_metrics_history(current_user: User = Depends(get_current_us
     """Get user's health metrics history"""
     try:
         metrics = await db.health_metrics.find(
-            {"user_id": current_user.id}
+            {"user_id": current_user.id},
+            {"_id": 0}
         ).sort("calculated_at", -1).to_list(50)
         
-        # Convert ObjectId to string for JSON serialization
-        for metric in metrics:
-            if "_id" in metric:
-                metric["_id"] = str(metric["_id"])
-        
         return {
             "metrics": metrics,
             "total_records": len(metrics)
@@ -2496,7 +2984,7 @@ async def add_body_measurements(
 ):
     """Add body measurements"""
     measurements.user_id = current_user.id
-    await db.body_measurements.insert_one(measurements.dict())
+    await db.body_measurements.insert_one(measurements.model_dump())
     return {"message": "Medidas corporales guardadas exitosamente"}
 
 @api_router.get("/body-measurements")
@@ -2515,40 +3003,41 @@ async def get_body_measurements(current_user: User = Depends(get_current_user)):
 async def get_health_analysis(current_user: User = Depends(get_current_user)):
     """Get comprehensive health analysis"""
     try:
-        # Get latest health metrics
-        latest_metrics = await db.health_metrics.find_one(
-            {"user_id": current_user.id},
-            sort=[("calculated_at", -1)]
+        # Latest metrics, the last 5 body measurements, the last 10 weigh-ins and the
+        # progress entry count are independent; fetch them concurrently
+        latest_metrics, recent_measurements, weight_entries, total_progress_entries = await asyncio.gather(
+            db.health_metrics.find_one(
+                {"user_id": current_user.id},
+                {"_id": 0},
+                sort=[("calculated_at", -1)]
+            ),
+            db.body_measurements.find(
+                {"user_id": current_user.id},
+                {"_id": 0}
+            ).sort("date", -1).limit(5).to_list(5),
+            db.progress.find(
+                {"user_id": current_user.id, "weight": {"$gt": 0}},
+                {"_id": 0, "date": 1, "weight": 1}
+            ).sort("date", -1).limit(10).to_list(10),
+            db.progress.count_documents({"user_id": current_user.id})
         )
         
-        # Get recent body measurements
-        recent_measurements = await db.body_measurements.find(
-            {"user_id": current_user.id}
-        ).sort("date", -1).to_list(10)
-        
-        # Get progress entries for weight tracking
-        progress_entries = await db.progress.find(
-            {"user_id": current_user.id}
-        ).sort("date", -1).to_list(30)
-        
         # Calculate trends if we have data
         weight_trend = None
-        if len(progress_entries) >= 2:
-            recent_weights = [entry.get("weight") for entry in progress_entries[:10] if entry.get("weight")]
-            if len(recent_weights) >= 2:
-                weight_change = recent_weights[0] - recent_weights[-1]
-                weight_trend = {
-                    "change": round(weight_change, 1),
-                    "direction": "increase" if weight_change > 0 else "decrease" if weight_change < 0 else "stable",
-                    "period_days": (progress_entries[0]["date"] - progress_entries[len(recent_weights)-1]["date"]).days
-                }
+        if len(weight_entries) >= 2:
+            weight_change = weight_entries[0]["weight"] - weight_entries[-1]["weight"]
+            weight_trend = {
+                "change": round(weight_change, 1),
+                "direction": "increase" if weight_change > 0 else "decrease" if weight_change < 0 else "stable",
+                "period_days": (weight_entries[0]["date"] - weight_entries[-1]["date"]).days
+            }
         
         return {
             "latest_metrics": latest_metrics,
-            "recent_measurements": recent_measurements[:5],  # Last 5 measurements
+            "recent_measurements": recent_measurements,
             "progress_summary": {
                 "weight_trend": weight_trend,
-                "total_progress_entries": len(progress_entries)
+                "total_progress_entries": total_progress_entries
             },
             "health_score": {
                 "bmi_score": 100 if latest_metrics and 18.5 <= latest_metrics.get("bmi", 0) <= 24.9 else 70,
@@ -2579,20 +3068,59 @@ async def chat_with_ai(message: str, current_user: User = Depends(get_current_us
         message=message,
         response=response
     )
-    await db.chat_history.insert_one(chat_message.dict())
+    await db.chat_history.insert_one(chat_message.model_dump())
     
     return {"response": response}
 
+@api_router.post("/chat/stream")
+async def chat_with_ai_stream(message: str, current_user: User = Depends(get_current_user)):
+    """Same as /chat, but streams the reply as server-sent events while it is generated"""
+    user_context = {
+        "goal": current_user.evaluation.goal if current_user.evaluation else None,
+        "activity_level": current_user.evaluation.activity_level if current_user.evaluation else None,
+        "experience_level": current_user.evaluation.experience_level if current_user.evaluation else None,
+        "daily_calories": current_user.daily_calories
+    }
+    chunks = []
+    
+    async def event_stream():
+        async for delta in stream_ai_response(message, user_context):
+            chunks.append(delta)
+            # JSON-encode each delta so newlines inside it can't break SSE framing
+            yield f"data: {orjson.dumps(delta).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    async def save_chat_history():
+        chat_message = ChatMessage(
+            user_id=current_user.id,
+            message=message,
+            response="".join(chunks)
+        )
+        await db.chat_history.insert_one(chat_message.model_dump())
+    
+    # History is written after the last byte is sent, so the client never waits on Mongo
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        background=BackgroundTask(save_chat_history)
+    )
+
+# The list endpoints below return documents written from their own models, projected to
+# the model's fields; returning a Response skips revalidating them against response_model
 @api_router.get("/chat/history", response_model=List[ChatMessage])
 async def get_chat_history(current_user: User = Depends(get_current_user)):
-    messages = await db.chat_history.find({"user_id": current_user.id}).sort("timestamp", -1).to_list(50)
-    return [ChatMessage(**msg) for msg in messages]
+    messages = await db.chat_history.find(
+        {"user_id": current_user.id}, CHAT_MESSAGE_PROJECTION
+    ).sort("timestamp", -1).to_list(50)
+    return ORJSONResponse(messages)
 
 # Notifications
 @api_router.get("/notifications", response_model=List[Notification])
 async def get_notifications(current_user: User = Depends(get_current_user)):
-    notifications = await db.notifications.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    return [Notification(**notif) for notif in notifications]
+    notifications = await db.notifications.find(
+        {"user_id": current_user.id}, NOTIFICATION_PROJECTION
+    ).sort("created_at", -1).to_list(100)
+    return ORJSONResponse(notifications)
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: User = Depends(get_current_user)):
@@ -2609,133 +3137,181 @@ async def get_forum_posts(category: Optional[str] = None):
     if category:
         query["category"] = category
     
-    posts = await db.forum_posts.find(query).sort("created_at", -1).to_list(100)
-    return [ForumPost(**post) for post in posts]
+    posts = await db.forum_posts.find(query, FORUM_POST_PROJECTION).sort("created_at", -1).to_list(100)
+    return ORJSONResponse(posts)
 
 @api_router.post("/forum", response_model=ForumPost)
 async def create_forum_post(post: ForumPost, current_user: User = Depends(get_current_user)):
     post.user_id = current_user.id
-    await db.forum_posts.insert_one(post.dict())
+    await db.forum_posts.insert_one(post.model_dump())
     return post
 
 # Food Database
 @api_router.get("/foods", response_model=List[Food])
-async def get_foods(search: Optional[str] = None):
+async def get_foods(search: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
     query = {}
     if search:
-        query["name"] = {"$regex": search, "$options": "i"}
+        query.update(name_prefix_match(search))
     
-    foods = await db.foods.find(query).to_list(100)
-    return [Food(**food) for food in foods]
+    entry = _food_list_cache.get(search)
+    if entry is None:
+        foods = await db.foods.find(query, {"_id": 0}).to_list(100)
+        entry = encode_catalog_list(_food_list_adapter, foods)
+        _food_list_cache.set(search, entry)
+    return catalog_response(entry, if_none_match)
 
 # Initialize default data
+async def seed_catalog(collection, docs: List[dict]) -> int:
+    """Insert the default documents whose name is missing; returns how many were inserted"""
+    # The lock below only covers this process; across workers the unique seed_key index
+    # rejects a second copy of a default, which here just means someone else seeded it
+    operations = [
+        UpdateOne(
+            {"name": doc["name"]},
+            {"$setOnInsert": {**doc, "name_lc": doc["name"].lower(), "seed_key": doc["name"]}},
+            upsert=True
+        )
+        for doc in docs
+    ]
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        return result.upserted_count
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        return e.details["nUpserted"]
+
+# Serializes concurrent /initialize-data calls so only one of them seeds the catalog;
+# once seeding is known to be done, later calls return without touching Mongo
+_init_data_lock = asyncio.Lock()
+_data_initialized = False
+
 @api_router.post("/initialize-data")
 async def initialize_default_data():
-    # Check if exercises already exist
-    existing_exercises = await db.exercises.count_documents({})
-    if existing_exercises > 0:
+    global _data_initialized
+    if _data_initialized:
         return {"message": "Data already initialized"}
     
-    # Default exercises
-    default_exercises = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Push-ups",
-            "description": "Classic upper body exercise",
-            "type": "strength",
-            "difficulty": "beginner",
-            "muscle_groups": ["chest", "shoulders", "triceps"],
-            "equipment": [],
-            "instructions": [
-                "Start in plank position",
-                "Lower body until chest nearly touches floor",
-                "Push back up to starting position"
-            ],
-            "duration_minutes": 15,
-            "calories_burned": 80,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Squats",
-            "description": "Lower body compound exercise",
-            "type": "strength",
-            "difficulty": "beginner",
-            "muscle_groups": ["quadriceps", "glutes", "hamstrings"],
-            "equipment": [],
-            "instructions": [
-                "Stand with feet hip-width apart",
-                "Lower body as if sitting back into chair",
-                "Return to standing position"
-            ],
-            "duration_minutes": 20,
-            "calories_burned": 100,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Running",
-            "description": "Cardiovascular exercise",
-            "type": "cardio",
-            "difficulty": "intermediate",
-            "muscle_groups": ["legs", "core"],
-            "equipment": ["running shoes"],
-            "instructions": [
-                "Start with warm-up walk",
-                "Gradually increase pace",
-                "Maintain steady rhythm"
-            ],
-            "duration_minutes": 30,
-            "calories_burned": 300,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    await db.exercises.insert_many(default_exercises)
-    
-    # Default foods
-    default_foods = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Chicken Breast",
-            "calories_per_100g": 165,
-            "protein": 31,
-            "carbs": 0,
-            "fat": 3.6,
-            "fiber": 0,
-            "sugar": 0,
-            "sodium": 74,
-            "category": "protein"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Brown Rice",
-            "calories_per_100g": 123,
-            "protein": 2.6,
-            "carbs": 23,
-            "fat": 0.9,
-            "fiber": 1.8,
-            "sugar": 0.4,
-            "sodium": 7,
-            "category": "carbs"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Broccoli",
-            "calories_per_100g": 34,
-            "protein": 2.8,
-            "carbs": 7,
-            "fat": 0.4,
-            "fiber": 2.6,
-            "sugar": 1.5,
-            "sodium": 33,
-            "category": "vegetables"
-        }
-    ]
-    
-    await db.foods.insert_many(default_foods)
-    
-    return {"message": "Default data initialized successfully"}
+    async with _init_data_lock:
+        # Another request may have finished seeding while this one waited
+        if _data_initialized:
+            return {"message": "Data already initialized"}
+        
+        now = datetime.utcnow()
+        
+        # Default exercises
+        default_exercises = [
+            {
+                "id": new_id(),
+                "name": "Push-ups",
+                "description": "Classic upper body exercise",
+                "type": "strength",
+                "difficulty": "beginner",
+                "muscle_groups": ["chest", "shoulders", "triceps"],
+                "equipment": [],
+                "instructions": [
+                    "Start in plank position",
+                    "Lower body until chest nearly touches floor",
+                    "Push back up to starting position"
+                ],
+                "duration_minutes": 15,
+                "calories_burned": 80,
+                "has_video": False,
+                "created_at": now
+            },
+            {
+                "id": new_id(),
+                "name": "Squats",
+                "description": "Lower body compound exercise",
+                "type": "strength",
+                "difficulty": "beginner",
+                "muscle_groups": ["quadriceps", "glutes", "hamstrings"],
+                "equipment": [],
+                "instructions": [
+                    "Stand with feet hip-width apart",
+                    "Lower body as if sitting back into chair",
+                    "Return to standing position"
+                ],
+                "duration_minutes": 20,
+                "calories_burned": 100,
+                "has_video": False,
+                "created_at": now
+            },
+            {
+                "id": new_id(),
+                "name": "Running",
+                "description": "Cardiovascular exercise",
+                "type": "cardio",
+                "difficulty": "intermediate",
+                "muscle_groups": ["legs", "core"],
+                "equipment": ["running shoes"],
+                "instructions": [
+                    "Start with warm-up walk",
+                    "Gradually increase pace",
+                    "Maintain steady rhythm"
+                ],
+                "duration_minutes": 30,
+                "calories_burned": 300,
+                "has_video": False,
+                "created_at": now
+            }
+        ]
+        
+        # Default foods
+        default_foods = [
+            {
+                "id": new_id(),
+                "name": "Chicken Breast",
+                "calories_per_100g": 165,
+                "protein": 31,
+                "carbs": 0,
+                "fat": 3.6,
+                "fiber": 0,
+                "sugar": 0,
+                "sodium": 74,
+                "category": "protein"
+            },
+            {
+                "id": new_id(),
+                "name": "Brown Rice",
+                "calories_per_100g": 123,
+                "protein": 2.6,
+                "carbs": 23,
+                "fat": 0.9,
+                "fiber": 1.8,
+                "sugar": 0.4,
+                "sodium": 7,
+                "category": "carbs"
+            },
+            {
+                "id": new_id(),
+                "name": "Broccoli",
+                "calories_per_100g": 34,
+                "protein": 2.8,
+                "carbs": 7,
+                "fat": 0.4,
+                "fiber": 2.6,
+                "sugar": 1.5,
+                "sodium": 33,
+                "category": "vegetables"
+            }
+        ]
+        
+        inserted_exercises, inserted_foods = await asyncio.gather(
+            seed_catalog(db.exercises, default_exercises),
+            seed_catalog(db.foods, default_foods)
+        )
+        _data_initialized = True
+        
+        if not inserted_exercises and not inserted_foods:
+            return {"message": "Data already initialized"}
+        
+        _exercise_list_cache.clear()
+        _exercise_stats_cache.clear()
+        _food_list_cache.clear()
+        _food_health_score_cache.clear()
+        
+        return {"message": "Default data initialized successfully"}
 
 # Health check
 @api_router.get("/health")
@@ -2781,7 +3357,7 @@ async def analyze_body_photo(
         }}
         """
         
-        response = openai_client.chat.completions.create(
+        response = await get_openai_client().chat.completions.create(
             model="gpt-4-vision-preview",
             messages=[
                 {
@@ -2799,7 +3375,7 @@ async def analyze_body_photo(
         
         # Try to parse as JSON, fallback to plain text
         try:
-            analysis_json = json.loads(ai_analysis)
+            analysis_json = orjson.loads(ai_analysis)
         except:
             analysis_json = {"raw_analysis": ai_analysis}
         
@@ -2817,7 +3393,7 @@ async def analyze_body_photo(
         )
         
         # Save to database
-        await db.photo_analysis.insert_one(result.dict())
+        await db.photo_analysis.insert_one(result.model_dump())
         
         return {
             "message": "Análisis de foto completado exitosamente",
@@ -2894,7 +3470,7 @@ async def recognize_food_from_image(
         }}
         """
         
-        response = openai_client.chat.completions.create(
+        response = await get_openai_client().chat.completions.create(
             model="gpt-4-vision-preview",
             messages=[
                 {
@@ -2912,7 +3488,7 @@ async def recognize_food_from_image(
         
         # Try to parse as JSON
         try:
-            recognition_json = json.loads(ai_analysis)
+            recognition_json = orjson.loads(ai_analysis)
         except:
             recognition_json = {"raw_analysis": ai_analysis}
         
@@ -2932,7 +3508,7 @@ async def recognize_food_from_image(
         )
         
         # Save to database
-        await db.food_recognition.insert_one(result.dict())
+        await db.food_recognition.insert_one(result.model_dump())
         
         return {
             "message": "Reconocimiento de alimentos completado exitosamente",
@@ -2982,23 +3558,22 @@ async def get_advanced_progress_analytics(
         else:  # year
             start_date = end_date - timedelta(days=365)
         
-        # Get progress data
-        progress_entries = await db.progress.find({
-            "user_id": current_user.id,
-            "date": {"$gte": start_date, "$lte": end_date}
-        }).sort("date", 1).to_list(1000)
-        
-        # Get water intake data
-        water_intake = await db.water_intake.find({
-            "user_id": current_user.id,
-            "date": {"$gte": start_date, "$lte": end_date}
-        }).sort("date", 1).to_list(1000)
-        
-        # Get workout completion data
-        workout_plans = await db.workout_plans.find({
-            "user_id": current_user.id,
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        }).sort("created_at", 1).to_list(1000)
+        # Progress, water intake and workout data are independent; fetch them concurrently
+        progress_entries, water_intake, workout_frequency = await asyncio.gather(
+            db.progress.find({
+                "user_id": current_user.id,
+                "date": {"$gte": start_date, "$lte": end_date}
+            }, {"_id": 0, "photos": 0, "notes": 0}).sort("date", 1).to_list(1000),
+            db.water_intake.find({
+                "user_id": current_user.id,
+                "date": {"$gte": start_date, "$lte": end_date}
+            }, {"_id": 0, "date": 1, "amount_ml": 1}).sort("date", 1).to_list(1000),
+            # Workouts are only counted, so let MongoDB count from the index
+            db.workout_plans.count_documents({
+                "user_id": current_user.id,
+                "created_at": {"$gte": start_date, "$lte": end_date}
+            })
+        )
         
         # Prepare chart data
         weight_data = []
@@ -3032,11 +3607,10 @@ async def get_advanced_progress_analytics(
         muscle_mass_trend = calculate_trend(muscle_mass_data)
         
         # Activity patterns
-        workout_frequency = len(workout_plans)
         avg_water_intake = sum(intake["amount_ml"] for intake in water_intake) / len(water_intake) if water_intake else 0
         
         # Goal progress calculation
-        user_evaluation = current_user.evaluation.dict() if current_user.evaluation else {}
+        user_evaluation = current_user.evaluation_dict
         goal_progress = calculate_goal_progress(progress_entries, user_evaluation)
         
         # Predictions (simple linear regression)
@@ -3091,26 +3665,18 @@ async def get_advanced_progress_analytics(
 async def detect_abandonment_patterns(current_user: User = Depends(get_current_user)):
     """Detect patterns indicating user abandonment or lack of engagement"""
     try:
-        # Get recent user activity
-        recent_progress = await db.progress.find({
-            "user_id": current_user.id,
-            "date": {"$gte": datetime.utcnow() - timedelta(days=30)}
-        }).sort("date", -1).to_list(100)
-        
-        recent_water_intake = await db.water_intake.find({
-            "user_id": current_user.id,
-            "date": {"$gte": datetime.utcnow() - timedelta(days=30)}
-        }).sort("date", -1).to_list(100)
-        
-        recent_workouts = await db.workout_plans.find({
-            "user_id": current_user.id,
-            "created_at": {"$gte": datetime.utcnow() - timedelta(days=30)}
-        }).sort("created_at", -1).to_list(100)
-        
-        recent_chat = await db.chat_history.find({
-            "user_id": current_user.id,
-            "timestamp": {"$gte": datetime.utcnow() - timedelta(days=30)}
-        }).sort("timestamp", -1).to_list(100)
+        # Get recent user activity, all four queries at once. Water, workouts and
+        # chat only matter as counts
+        since = datetime.utcnow() - timedelta(days=30)
+        recent_progress, recent_water_intake_count, recent_workouts_count, recent_chat_count = await asyncio.gather(
+            db.progress.find({
+                "user_id": current_user.id,
+                "date": {"$gte": since}
+            }, {"_id": 0, "date": 1, "weight": 1}).sort("date", -1).to_list(100),
+            db.water_intake.count_documents({"user_id": current_user.id, "date": {"$gte": since}}),
+            db.workout_plans.count_documents({"user_id": current_user.id, "created_at": {"$gte": since}}),
+            db.chat_history.count_documents({"user_id": current_user.id, "timestamp": {"$gte": since}})
+        )
         
         alerts = []
         
@@ -3125,7 +3691,7 @@ async def detect_abandonment_patterns(current_user: User = Depends(get_current_u
                 recommendations=["Registra tu peso y medidas regularmente", "Toma fotos de progreso semanales"]
             ))
         
-        if len(recent_water_intake) < 5:
+        if recent_water_intake_count < 5:
             alerts.append(PatternAlert(
                 user_id=current_user.id,
                 alert_type="abandonment",
@@ -3135,7 +3701,7 @@ async def detect_abandonment_patterns(current_user: User = Depends(get_current_u
                 recommendations=["Establece recordatorios de hidratación", "Lleva una botella de agua contigo"]
             ))
         
-        if len(recent_workouts) == 0:
+        if recent_workouts_count == 0:
             alerts.append(PatternAlert(
                 user_id=current_user.id,
                 alert_type="abandonment",
@@ -3160,18 +3726,18 @@ async def detect_abandonment_patterns(current_user: User = Depends(get_current_u
                         recommendations=["Considera ajustar tu plan nutricional", "Incrementa la intensidad del ejercicio"]
                     ))
         
-        # Save alerts to database
-        for alert in alerts:
-            await db.pattern_alerts.insert_one(alert.dict())
+        # Save alerts to database in one round trip
+        if alerts:
+            await db.pattern_alerts.insert_many([alert.model_dump() for alert in alerts])
         
         return {
-            "alerts": [alert.dict() for alert in alerts],
+            "alerts": [alert.model_dump() for alert in alerts],
             "total_alerts": len(alerts),
             "activity_summary": {
                 "progress_entries": len(recent_progress),
-                "water_records": len(recent_water_intake),
-                "workout_plans": len(recent_workouts),
-                "chat_interactions": len(recent_chat)
+                "water_records": recent_water_intake_count,
+                "workout_plans": recent_workouts_count,
+                "chat_interactions": recent_chat_count
             }
         }
         
@@ -3185,19 +3751,11 @@ async def get_pattern_alerts(current_user: User = Depends(get_current_user)):
         alerts = await db.pattern_alerts.find({
             "user_id": current_user.id,
             "is_active": True
-        }).sort("created_at", -1).to_list(100)
-        
-        # Convert alerts to proper format, handling ObjectId
-        formatted_alerts = []
-        for alert in alerts:
-            # Convert ObjectId to string if present
-            if "_id" in alert:
-                del alert["_id"]
-            formatted_alerts.append(alert)
+        }, {"_id": 0}).sort("created_at", -1).to_list(100)
         
         return {
-            "alerts": formatted_alerts,
-            "total_count": len(formatted_alerts)
+            "alerts": alerts,
+            "total_count": len(alerts)
         }
         
     except Exception as e:
@@ -3320,259 +3878,102 @@ def generate_achievements(progress_entries):
     
     return achievements
 
-def generate_achievements(progress_entries):
-    """Generate achievements based on progress"""
-    achievements = []
-    
-    if len(progress_entries) >= 7:
-        achievements.append("Seguimiento consistente por 7 días")
-    
-    if len(progress_entries) >= 30:
-        achievements.append("¡Un mes de seguimiento!")
-    
-    return achievements
-
-def build_exercise_query(filters):
-    """Build MongoDB query for exercise filtering"""
-    query = {}
-    
-    if filters.name:
-        query["name"] = {"$regex": filters.name, "$options": "i"}
-    
-    if filters.type:
-        query["type"] = filters.type
-    
-    if filters.difficulty:
-        query["difficulty"] = filters.difficulty
-    
-    if filters.muscle_group:
-        query["muscle_groups"] = {"$in": [filters.muscle_group]}
-    
-    if filters.equipment:
-        query["equipment"] = {"$in": [filters.equipment]}
-    
-    if filters.min_duration:
-        query["duration_minutes"] = {"$gte": filters.min_duration}
-    
-    if filters.max_duration:
-        query["duration_minutes"] = {"$lte": filters.max_duration}
-    
-    if filters.min_calories:
-        query["calories_burned"] = {"$gte": filters.min_calories}
-    
-    if filters.max_calories:
-        query["calories_burned"] = {"$lte": filters.max_calories}
-    
-    return query
-
-def calculate_food_health_score(food):
-    """Calculate health score for a food item"""
-    score = 50  # Base score
-    
-    # Positive factors
-    if food.get("protein", 0) >= 10:
-        score += 15
-    if food.get("fiber", 0) >= 5:
-        score += 10
-    if food.get("vitamin_c", 0) >= 10:
-        score += 5
-    if food.get("calcium", 0) >= 100:
-        score += 5
-    
-    # Negative factors
-    if food.get("sugar", 0) >= 20:
-        score -= 15
-    if food.get("sodium", 0) >= 500:
-        score -= 10
-    if food.get("saturated_fat", 0) >= 10:
-        score -= 10
-    
-    return max(0, min(100, score))
-
-def generate_smart_shopping_list(plan, user_preferences):
-    """Generate intelligent shopping list from nutrition plan"""
-    # This is a simplified version - in production would be more sophisticated
-    items = []
-    categories = set()
-    
-    # Basic items based on plan
-    basic_items = [
-        {"name": "Pollo", "category": "Carnes", "quantity": "1 kg", "price": 15.0},
-        {"name": "Arroz integral", "category": "Granos", "quantity": "1 paquete", "price": 8.0},
-        {"name": "Brócoli", "category": "Verduras", "quantity": "500g", "price": 5.0},
-        {"name": "Huevos", "category": "Lácteos", "quantity": "1 docena", "price": 6.0},
-        {"name": "Avena", "category": "Granos", "quantity": "1 paquete", "price": 4.0},
-    ]
-    
-    for item in basic_items:
-        categories.add(item["category"])
-        items.append(item)
-    
-    total_cost = sum(item["price"] for item in items)
-    
-    return {
-        "items": items,
-        "categories": list(categories),
-        "total_items": len(items),
-        "estimated_cost": total_cost
-    }
-
-def generate_supplement_recommendations(user_evaluation, health_metrics):
-    """Generate personalized supplement recommendations"""
-    recommendations = []
-    
-    # Basic recommendations based on user profile
-    if user_evaluation.goal == "build_muscle":
-        recommendations.append({
-            "name": "Proteína en polvo",
-            "reason": "Apoyo para el desarrollo muscular",
-            "priority": "high",
-            "confidence": 0.9
-        })
-    
-    if user_evaluation.goal == "lose_weight":
-        recommendations.append({
-            "name": "Té verde",
-            "reason": "Apoyo para la pérdida de peso",
-            "priority": "medium",
-            "confidence": 0.7
-        })
-    
-    # Age-based recommendations
-    if user_evaluation.age > 30:
-        recommendations.append({
-            "name": "Vitamina D",
-            "reason": "Importante para la salud ósea después de los 30",
-            "priority": "medium",
-            "confidence": 0.8
-        })
-    
-    if user_evaluation.age > 40:
-        recommendations.append({
-            "name": "Omega 3",
-            "reason": "Beneficioso para la salud cardiovascular",
-            "priority": "high",
-            "confidence": 0.9
-        })
-    
-    # Gender-based recommendations
-    if user_evaluation.gender == "female":
-        recommendations.append({
-            "name": "Hierro",
-            "reason": "Importante para mujeres debido a la menstruación",
-            "priority": "medium",
-            "confidence": 0.8
-        })
-    
-    # Activity level recommendations
-    if user_evaluation.activity_level in ["very_active", "extremely_active"]:
-        recommendations.append({
-            "name": "Electrolitos",
-            "reason": "Reposición debido a alta actividad física",
-            "priority": "medium",
-            "confidence": 0.7
-        })
-    
-    return recommendations
-
-def calculate_bmi(weight, height):
-    """Calculate BMI"""
-    height_m = height / 100  # Convert cm to meters
-    return weight / (height_m ** 2)
-
-def get_bmi_category(bmi):
-    """Get BMI category"""
-    if bmi < 18.5:
-        return "Bajo peso"
-    elif bmi < 25:
-        return "Normal"
-    elif bmi < 30:
-        return "Sobrepeso"
-    else:
-        return "Obesidad"
-
-def calculate_body_fat_percentage(gender, age, bmi):
-    """Calculate body fat percentage using BMI method"""
-    if gender == "male":
-        return (1.20 * bmi) + (0.23 * age) - 16.2
-    else:  # female
-        return (1.20 * bmi) + (0.23 * age) - 5.4
-
-def calculate_body_fat_navy(gender, height, neck, waist, hip=None):
-    """Calculate body fat using Navy method"""
-    if gender == "male":
-        return 495 / (1.0324 - 0.19077 * math.log10(waist - neck) + 0.15456 * math.log10(height)) - 450
-    else:  # female
-        if hip:
-            return 495 / (1.29579 - 0.35004 * math.log10(waist + hip - neck) + 0.22100 * math.log10(height)) - 450
-        else:
-            return calculate_body_fat_percentage(gender, 30, calculate_bmi(70, height))  # Fallback
-
-def calculate_ideal_weight(height, gender):
-    """Calculate ideal weight range"""
-    height_m = height / 100
-    
-    # Using BMI 18.5-24.9 for normal range
-    min_weight = 18.5 * (height_m ** 2)
-    max_weight = 24.9 * (height_m ** 2)
-    
-    return {"min": round(min_weight, 1), "max": round(max_weight, 1)}
+# MongoDB indexes: equality fields first, then the sort key each list endpoint uses
+# Append-only per-user measurements, always read for one user newest first
+TIME_SERIES_COLLECTIONS = {
+    "progress": "date",
+    "health_metrics": "calculated_at",
+    "body_measurements": "date",
+}
+
+async def ensure_time_series_collections():
+    # Only new deployments get bucketed storage; existing regular collections are left as they are
+    existing = set(await db.list_collection_names())
+    for name, time_field in TIME_SERIES_COLLECTIONS.items():
+        if name not in existing:
+            await db.create_collection(
+                name,
+                timeseries={"timeField": time_field, "metaField": "user_id", "granularity": "hours"}
+            )
 
-def calculate_daily_calorie_needs(weight, height, age, gender, activity_level):
-    """Calculate daily calorie needs using Harris-Benedict equation"""
-    # Calculate BMR
-    if gender == "male":
-        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-    else:  # female
-        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
-    
-    # Activity multipliers
-    activity_multipliers = {
-        "sedentary": 1.2,
-        "lightly_active": 1.375,
-        "moderately_active": 1.55,
-        "very_active": 1.725,
-        "extremely_active": 1.9
-    }
-    
-    multiplier = activity_multipliers.get(activity_level, 1.2)
-    
-    return round(bmr * multiplier, 0)
+async def create_index(collection, keys, **options):
+    """create_index that logs a rejected index instead of skipping the ones after it"""
+    try:
+        await collection.create_index(keys, **options)
+    except Exception as e:
+        logger.warning(f"Could not create index {keys} on {collection.name}: {str(e)}")
+
+async def ensure_indexes():
+    # Lookup keys of the /initialize-data upserts (user-created exercises may repeat names);
+    # only seeded documents carry seed_key, and no default may be stored twice. Created first:
+    # concurrent workers' seeding relies on the unique index, not just its speed
+    for catalog in (db.exercises, db.foods):
+        await create_index(catalog, "name")
+        await create_index(
+            catalog, "seed_key", unique=True, partialFilterExpression={"seed_key": {"$exists": True}}
+        )
+    await create_index(db.users, "email", unique=True)
+    await create_index(db.users, "id", unique=True)
+    # weight rides along so the health analysis weight-trend query is covered by the index
+    await create_index(db.progress, [("user_id", 1), ("date", -1), ("weight", 1)])
+    await create_index(db.chat_history, [("user_id", 1), ("timestamp", -1)])
+    await create_index(db.notifications, [("user_id", 1), ("created_at", -1)])
+    await create_index(db.notifications, [("user_id", 1), ("id", 1)])
+    await create_index(db.water_intake, [("user_id", 1), ("date", 1)])
+    await create_index(db.health_metrics, [("user_id", 1), ("calculated_at", -1)])
+    await create_index(db.body_measurements, [("user_id", 1), ("date", -1)])
+    await create_index(db.forum_posts, [("category", 1), ("created_at", -1)])
+    # The unfiltered forum listing sorts on created_at alone
+    await create_index(db.forum_posts, [("created_at", -1)])
+    await create_index(db.exercises, [("type", 1), ("difficulty", 1), ("muscle_groups", 1)])
+    await create_index(db.exercises, [("type", 1), ("difficulty", 1), ("intensity_level", 1)])
+    await create_index(db.exercises, "muscle_groups")
+    await create_index(db.exercises, "equipment")
+    await create_index(db.exercises, "tags")
+    await create_index(db.exercises, "has_video")
+    await create_index(db.foods, "id", unique=True)
+    # Case-insensitive name prefix search
+    await create_index(db.exercises, "name_lc")
+    await create_index(db.foods, "name_lc")
+    await create_index(db.exercise_reviews, [("exercise_id", 1), ("user_id", 1)])
+    await create_index(db.supplements, "name_lc")
+    await create_index(db.supplement_reviews, "supplement_id")
+    # Plan and list lookups are either by owner or by owner + id
+    await create_index(db.nutrition_plans, [("user_id", 1), ("id", 1)])
+    await create_index(db.nutrition_plans, [("user_id", 1), ("created_at", -1)])
+    await create_index(db.shopping_lists, [("user_id", 1), ("id", 1)])
+    await create_index(db.workout_plans, [("user_id", 1), ("id", 1)])
+    await create_index(db.workout_plans, [("user_id", 1), ("created_at", -1)])
+
+# Collections searched by name prefix; their documents carry a lower-cased name_lc copy
+NAME_SEARCH_COLLECTIONS = ("foods", "exercises", "supplements")
+
+# Fills name_lc on documents stored before the field existed (or inserted outside the API)
+async def backfill_name_lc():
+    for collection in NAME_SEARCH_COLLECTIONS:
+        await db[collection].update_many(
+            {"name_lc": {"$exists": False}},
+            [{"$set": {"name_lc": {"$toLower": "$name"}}}]
+        )
 
-def generate_health_recommendations(bmi, body_fat, age, gender, goal):
-    """Generate health recommendations based on metrics"""
-    recommendations = []
-    
-    # BMI recommendations
-    if bmi < 18.5:
-        recommendations.append("Considera aumentar tu ingesta calórica de manera saludable")
-    elif bmi > 25:
-        recommendations.append("Considera reducir tu ingesta calórica y aumentar la actividad física")
-    
-    # Body fat recommendations
-    if gender == "male":
-        if body_fat > 25:
-            recommendations.append("Tu porcentaje de grasa corporal está alto, considera ejercicio cardiovascular")
-        elif body_fat < 6:
-            recommendations.append("Tu porcentaje de grasa corporal está muy bajo, consulta con un profesional")
-    else:  # female
-        if body_fat > 32:
-            recommendations.append("Tu porcentaje de grasa corporal está alto, considera ejercicio cardiovascular")
-        elif body_fat < 16:
-            recommendations.append("Tu porcentaje de grasa corporal está muy bajo, consulta con un profesional")
-    
-    # Age-based recommendations
-    if age > 40:
-        recommendations.append("Incluye ejercicios de resistencia para mantener la masa muscular")
-    
-    if age > 50:
-        recommendations.append("Considera suplementos de calcio y vitamina D")
-    
-    # General recommendations
-    recommendations.append("Mantén una hidratación adecuada (8 vasos de agua al día)")
-    recommendations.append("Incluye frutas y verduras en tu dieta diaria")
-    
-    return recommendations
+# Fills has_video on exercises stored before the field existed; matches nothing once done
+async def backfill_exercise_has_video():
+    await db.exercises.update_many(
+        {"has_video": {"$exists": False}},
+        [{"$set": {"has_video": {"$ne": [{"$ifNull": ["$video_url", ""]}, ""]}}}]
+    )
 
 # Include router in main app
-app.include_router(api_router)
\ No newline at end of file
+app.include_router(api_router)
+if __name__ == "__main__":
+    import uvicorn
+    # In-process caches (e.g. _token_cache) are per worker, so extra workers are opt-in
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8001")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        access_log=False
+    )
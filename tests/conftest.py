@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dracco_test")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+class MockCollection:
+    """mongomock-motor collection with PyMongo's async API, where aggregate() is awaited"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def aggregate(self, *args, **kwargs):
+        return self._collection.aggregate(*args, **kwargs)
+
+
+class MockDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        return MockCollection(self._database[name])
+
+    def __getitem__(self, name):
+        return MockCollection(self._database[name])
+
+    async def list_collection_names(self):
+        return await self._database.list_collection_names()
+
+
+def run(coroutine):
+    """Run a database call from a synchronous test"""
+    return asyncio.run(coroutine)
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, answering every request with the same message"""
+
+    def __init__(self, message):
+        self.message = message
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=self.message)])
+
+
+def fake_openai(monkeypatch, message):
+    completions = FakeCompletions(message)
+    monkeypatch.setattr(server, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(server, "get_openai_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+
+def tool_call_message(arguments):
+    return SimpleNamespace(tool_calls=[SimpleNamespace(function=SimpleNamespace(arguments=arguments))])
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database behind server.db, with every in-process cache emptied"""
+    database = MockDatabase(AsyncMongoMockClient()["dracco_test"])
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "_data_initialized", False)
+    for cache in (
+        server._token_cache,
+        server._exercise_list_cache,
+        server._food_list_cache,
+        server._exercise_stats_cache,
+        server._food_health_score_cache,
+        server._ai_response_cache,
+    ):
+        cache.clear()
+    return database
+
+
+@pytest.fixture
+def client(db):
+    # Not entered as a context manager: the lifespan would close the shared HTTP clients
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post(
+        "/api/register",
+        json={"email": "tester@example.com", "password": "secret123", "full_name": "Tester"},
+    )
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_id(client, auth_headers):
+    return client.get("/api/profile", headers=auth_headers).json()["id"]
@@ -0,0 +1,39 @@
+import time
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+import server
+from tests.conftest import fake_openai, run, tool_call_message
+
+EVALUATION = {"age": 30, "gender": "female", "weight": 60, "height": 165, "goal": "maintain"}
+NUTRITION_PLAN = {"plan_name": "Plan", "total_calories": 2000, "duration": "7 días", "days": [], "tips": [], "shopping_list": []}
+
+
+def cached_expiry():
+    [(expires_at, _)] = server._ai_response_cache._data.values()
+    return expires_at
+
+
+@pytest.mark.parametrize("generate, message", [
+    (lambda: server.generate_nutrition_plan_ai(EVALUATION, 2000), tool_call_message(orjson.dumps(NUTRITION_PLAN).decode())),
+    (lambda: server.generate_workout_plan_ai(EVALUATION, "user-1"), SimpleNamespace(content='{"plan_name": "Rutina"}')),
+])
+def test_cache_hit_does_not_extend_the_expiry(db, monkeypatch, generate, message):
+    completions = fake_openai(monkeypatch, message)
+    first = run(generate())
+    expires_at = cached_expiry()
+
+    later = time.monotonic() + server.AI_RESPONSE_CACHE_TTL_SECONDS / 2
+    monkeypatch.setattr(server.time, "monotonic", lambda: later)
+    assert run(generate()) == first
+    assert completions.calls == 1
+    assert cached_expiry() == expires_at
+
+
+def test_unparseable_plan_is_not_cached(db, monkeypatch):
+    completions = fake_openai(monkeypatch, tool_call_message("not json"))
+    assert "error" in run(server.generate_nutrition_plan_ai(EVALUATION, 2000))
+    assert "error" in run(server.generate_nutrition_plan_ai(EVALUATION, 2000))
+    assert completions.calls == 2
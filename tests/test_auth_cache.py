@@ -0,0 +1,45 @@
+import time
+
+import server
+from tests.conftest import run
+
+EVALUATION = {
+    "age": 30,
+    "gender": "male",
+    "weight": 80,
+    "height": 180,
+    "activity_level": "sedentary",
+    "goal": "lose_weight",
+    "experience_level": "beginner",
+}
+
+
+def rename_user(db, user_id, full_name):
+    """Change the stored user behind the API's back, as another worker would"""
+    run(db.users.update_one({"id": user_id}, {"$set": {"full_name": full_name}}))
+
+
+def test_cached_user_is_served_until_the_ttl_expires(client, db, auth_headers, user_id, monkeypatch):
+    rename_user(db, user_id, "Renamed")
+    assert client.get("/api/profile", headers=auth_headers).json()["full_name"] == "Tester"
+
+    expired = time.monotonic() + server.TOKEN_CACHE_TTL_SECONDS + 1
+    monkeypatch.setattr(server.time, "monotonic", lambda: expired)
+    assert client.get("/api/profile", headers=auth_headers).json()["full_name"] == "Renamed"
+
+
+def test_evaluation_update_invalidates_the_cached_user(client, db, auth_headers, user_id):
+    assert client.get("/api/profile", headers=auth_headers).json()["evaluation"] is None
+
+    response = client.put("/api/evaluation", headers=auth_headers, json=EVALUATION)
+    assert response.status_code == 200
+
+    profile = client.get("/api/profile", headers=auth_headers).json()
+    assert profile["evaluation"]["goal"] == "lose_weight"
+    assert profile["daily_calories"] == response.json()["daily_calories"]
+
+
+def test_invalid_token_is_rejected_and_not_cached(client, db):
+    response = client.get("/api/profile", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+    assert server._token_cache.get("not-a-jwt") is None
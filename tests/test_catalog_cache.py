@@ -0,0 +1,40 @@
+NEW_EXERCISE = {
+    "name": "Plancha",
+    "description": "Core isométrico",
+    "type": "strength",
+    "difficulty": "beginner",
+    "muscle_groups": ["core"],
+    "equipment": [],
+    "instructions": ["Mantén la posición"],
+    "duration_minutes": 5,
+    "calories_burned": 20,
+}
+
+
+def test_matching_if_none_match_gets_an_empty_304(client):
+    client.post("/api/initialize-data")
+    first = client.get("/api/foods")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    cached = client.get("/api/foods", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # Any tag in the list matches, weak or not
+    assert client.get("/api/foods", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/api/foods", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_catalog_write_produces_a_new_etag(client, auth_headers):
+    client.post("/api/initialize-data")
+    before = client.get("/api/exercises")
+    etag = before.headers["etag"]
+
+    assert client.post("/api/exercises", headers=auth_headers, json=NEW_EXERCISE).status_code == 200
+
+    after = client.get("/api/exercises", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+    assert len(after.json()) == len(before.json()) + 1
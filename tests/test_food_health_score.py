@@ -0,0 +1,32 @@
+import pytest
+
+import server
+
+# The threshold scores the API has always returned for the seeded foods; a per-100-kcal
+# density scorer would give about 65.5, 52.6 and 53.1 instead
+SEEDED_SCORES = {"Chicken Breast": 65, "Brown Rice": 50, "Broccoli": 50}
+
+
+@pytest.mark.parametrize("food, score", [
+    ({}, 50),
+    ({"protein": 10, "fiber": 5, "vitamin_c": 10, "calcium": 100}, 85),
+    ({"protein": 9.9, "fiber": 4.9, "vitamin_c": 9.9, "calcium": 99}, 50),
+    ({"sugar": 20, "sodium": 500, "saturated_fat": 10}, 15),
+    ({"calories_per_100g": 1, "trans_fat": 5, "vitamin_a": 1}, 50),
+])
+def test_score_uses_fixed_thresholds(food, score):
+    assert server.calculate_food_health_score(food) == score
+
+
+def test_seeded_foods_keep_their_scores_on_every_endpoint(client):
+    client.post("/api/initialize-data")
+    foods = client.get("/api/foods/search").json()["foods"]
+    assert {food["name"]: food["health_score"] for food in foods} == SEEDED_SCORES
+
+    ids = {food["name"]: food["id"] for food in foods}
+    compared = client.post("/api/foods/compare", json={"foods": list(ids.values())}).json()["comparison_data"]
+    assert {food["name"]: food["health_score"] for food in compared} == SEEDED_SCORES
+
+    for name, food_id in ids.items():
+        label = client.post(f"/api/foods/{food_id}/nutrition-label").json()
+        assert label["health_score"] == SEEDED_SCORES[name]
@@ -0,0 +1,69 @@
+from pymongo.errors import OperationFailure
+
+import server
+from tests.conftest import MockCollection, run
+
+
+def catalog_counts(db):
+    return run(db.exercises.count_documents({})), run(db.foods.count_documents({}))
+
+
+def test_second_initialize_call_inserts_nothing(client, db):
+    first = client.post("/api/initialize-data")
+    assert first.json() == {"message": "Default data initialized successfully"}
+    seeded = catalog_counts(db)
+    assert seeded == (3, 3)
+
+    # A fresh worker has no in-process flag; the name upserts must still be no-ops
+    server._data_initialized = False
+    second = client.post("/api/initialize-data")
+    assert second.json() == {"message": "Data already initialized"}
+    assert catalog_counts(db) == seeded
+
+
+def test_seeding_fills_in_only_missing_defaults(client, db):
+    run(db.exercises.insert_one({"id": "existing", "name": "Squats", "description": "mine"}))
+
+    client.post("/api/initialize-data")
+
+    squats = run(db.exercises.find({"name": "Squats"}).to_list(None))
+    assert [exercise["description"] for exercise in squats] == ["mine"]
+    assert catalog_counts(db) == (3, 3)
+
+
+def test_default_copied_by_another_worker_is_not_stored_twice(client, db):
+    run(server.ensure_indexes())
+    # Another worker's seed of the same default, stored under a name this upsert can't match
+    run(db.exercises.insert_one({"id": "other-worker", "name": "Squats ", "seed_key": "Squats"}))
+
+    response = client.post("/api/initialize-data")
+    assert response.status_code == 200
+    assert run(db.exercises.count_documents({"seed_key": "Squats"})) == 1
+    assert run(db.exercises.count_documents({"seed_key": {"$in": ["Push-ups", "Running"]}})) == 2
+
+
+def test_seed_bookkeeping_fields_stay_out_of_responses(client):
+    client.post("/api/initialize-data")
+    documents = [
+        *client.get("/api/exercises").json(),
+        *client.get("/api/foods", params={"search": "chick"}).json(),
+        *client.get("/api/foods/search", params={"q": "chick"}).json()["foods"],
+    ]
+    assert len(documents) == 5
+    for document in documents:
+        assert "seed_key" not in document and "name_lc" not in document
+
+
+def test_rejected_index_does_not_skip_the_others(db, monkeypatch):
+    async def reject_on_progress(self, keys, **options):
+        if self._collection.name == "progress":
+            raise OperationFailure("time-series collections only support indexes on the metaField and timeField")
+        return await self._collection.create_index(keys, **options)
+
+    # MockCollection forwards create_index through __getattr__, so there is no attribute to replace
+    monkeypatch.setattr(MockCollection, "create_index", reject_on_progress, raising=False)
+    run(server.ensure_indexes())
+
+    for collection in (db.exercises, db.foods, db.workout_plans):
+        assert len(run(collection.index_information())) > 1
+    assert "seed_key_1" in run(db.exercises.index_information())
@@ -0,0 +1,77 @@
+import server
+from tests.conftest import run
+
+
+def meal(meal_type, calories):
+    return {
+        "id": f"{meal_type}-{calories}",
+        "name": "Comida",
+        "foods": [],
+        "total_calories": calories,
+        "total_protein": calories / 10,
+        "total_carbs": calories / 8,
+        "total_fat": calories / 30,
+        "meal_type": meal_type,
+        "instructions": "Receta larga que el análisis no necesita",
+    }
+
+
+MEALS = {
+    "Lunes": [meal("desayuno", 400), meal("cena", 700)],
+    "Martes": [meal("almuerzo", 900)],
+}
+
+
+def insert_plan(db, user_id, **fields):
+    run(db.nutrition_plans.insert_one({
+        "id": "plan-1", "user_id": user_id, "daily_calories": 2000, "meals": MEALS, **fields
+    }))
+
+
+def stored_analysis(db):
+    return run(db.nutrition_plans.find_one({"id": "plan-1"})).get("precomputed_analysis")
+
+
+def test_plan_without_stored_analysis_is_computed_and_written_back(client, db, auth_headers, user_id):
+    insert_plan(db, user_id)
+
+    response = client.get("/api/nutrition-analysis/plan-1", headers=auth_headers)
+    assert response.status_code == 200
+    analysis = response.json()
+    assert analysis["plan_id"] == "plan-1"
+    assert analysis["weekly_summary"]["total_calories"] == 2000
+    assert analysis["daily_averages"]["calories"] == 1000
+    assert analysis["meal_distribution"] == {"desayuno": 400, "almuerzo": 900, "merienda": 0, "cena": 700}
+    assert analysis["calorie_variance"] == -1000
+
+    expected = server.compute_nutrition_analysis(MEALS, 2000)
+    assert stored_analysis(db) == expected
+    assert {key: value for key, value in analysis.items() if key != "plan_id"} == expected
+
+
+def test_stored_analysis_is_returned_without_recomputing(client, db, auth_headers, user_id, monkeypatch):
+    stored = {**server.compute_nutrition_analysis(MEALS, 2000), "calorie_variance": 123}
+    insert_plan(db, user_id, precomputed_analysis=stored)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the stored analysis should be used")
+
+    monkeypatch.setattr(server, "compute_nutrition_analysis", fail)
+    response = client.get("/api/nutrition-analysis/plan-1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["calorie_variance"] == 123
+
+
+def test_plan_without_meals_gets_an_empty_analysis(client, db, auth_headers, user_id):
+    run(db.nutrition_plans.insert_one({"id": "plan-1", "user_id": user_id, "daily_calories": 1800}))
+
+    analysis = client.get("/api/nutrition-analysis/plan-1", headers=auth_headers).json()
+    assert analysis["daily_breakdown"] == {}
+    assert analysis["target_calories"] == 1800
+    assert analysis["calorie_variance"] == -1800
+
+
+def test_other_users_plan_is_not_found(client, db, auth_headers):
+    run(db.nutrition_plans.insert_one({"id": "plan-1", "user_id": "someone-else", "meals": MEALS}))
+    assert client.get("/api/nutrition-analysis/plan-1", headers=auth_headers).status_code == 404
+    assert stored_analysis(db) is None
@@ -0,0 +1,23 @@
+from tests.conftest import run
+
+ENTRY = {"user_id": "ignored", "weight": 72.5, "measurements": {"waist": 80}, "photos": ["aGVsbG8="], "notes": "Semana 1"}
+
+
+def test_history_leaves_photos_out_and_the_entry_returns_them(client, auth_headers):
+    created = client.post("/api/progress", headers=auth_headers, json=ENTRY).json()
+
+    [summary] = client.get("/api/progress", headers=auth_headers).json()
+    assert "photos" not in summary
+    assert summary["id"] == created["id"]
+    assert summary["weight"] == 72.5
+
+    entry = client.get(f"/api/progress/{created['id']}", headers=auth_headers)
+    assert entry.status_code == 200
+    assert entry.json()["photos"] == ["aGVsbG8="]
+
+
+def test_other_users_entry_is_not_found(client, db, auth_headers):
+    run(db.progress.insert_one({"id": "theirs", "user_id": "someone-else", "photos": ["eA=="]}))
+    response = client.get("/api/progress/theirs", headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Progress entry not found"
@@ -0,0 +1,130 @@
+import orjson
+import pytest
+
+from tests.conftest import fake_openai, run, tool_call_message
+
+
+def item(name):
+    return {"name": name, "quantity": "1", "category": "Otros", "purchased": False}
+
+
+@pytest.fixture
+def shopping_list(db, user_id):
+    run(db.shopping_lists.insert_one({
+        "id": "list-1",
+        "user_id": user_id,
+        "name": "Lista de Compras",
+        "items": [item("Avena"), item("Leche"), item("Pollo")],
+    }))
+    return "list-1"
+
+
+def stored_items(db, list_id):
+    return run(db.shopping_lists.find_one({"id": list_id}))["items"]
+
+
+def test_item_update_changes_only_the_target_item(client, db, auth_headers, shopping_list):
+    response = client.put(
+        f"/api/shopping-lists/{shopping_list}/items/1", params={"purchased": True}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    items = stored_items(db, shopping_list)
+    assert [entry["purchased"] for entry in items] == [False, True, False]
+    assert items[1] == {**item("Leche"), "purchased": True}
+
+
+@pytest.mark.parametrize("list_id, item_index, detail", [
+    ("missing-list", 0, "Shopping list not found"),
+    ("list-1", 3, "Item not found"),
+    ("list-1", -1, "Item not found"),
+])
+def test_missing_list_and_missing_item_are_told_apart(
+    client, db, auth_headers, shopping_list, list_id, item_index, detail
+):
+    response = client.put(
+        f"/api/shopping-lists/{list_id}/items/{item_index}", params={"purchased": True}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+    assert [entry["purchased"] for entry in stored_items(db, shopping_list)] == [False, False, False]
+
+
+def test_other_users_list_is_not_found(client, db, auth_headers):
+    run(db.shopping_lists.insert_one({"id": "theirs", "user_id": "someone-else", "items": [item("Avena")]}))
+    response = client.put("/api/shopping-lists/theirs/items/0", params={"purchased": True}, headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Shopping list not found"
+
+
+def insert_plan(db, user_id, **fields):
+    run(db.nutrition_plans.insert_one({"id": "plan-1", "user_id": user_id, "daily_calories": 2000, **fields}))
+    return "plan-1"
+
+
+def test_generated_list_has_one_line_per_distinct_item(client, db, auth_headers, user_id):
+    plan_id = insert_plan(db, user_id, meals={}, shopping_list=["Avena", "avena ", "Leche", "Avena", " "])
+
+    response = client.post(f"/api/shopping-lists/generate/{plan_id}", headers=auth_headers)
+    assert response.status_code == 200
+
+    items = response.json()["items"]
+    assert [(entry["name"], entry["quantity"]) for entry in items] == [("Avena", "3"), ("Leche", "1")]
+    assert all(entry["purchased"] is False for entry in items)
+    stored = run(db.shopping_lists.find_one({"id": response.json()["shopping_list_id"]}))
+    assert stored["items"] == items
+
+
+def test_generated_list_falls_back_to_meal_ingredients(client, db, auth_headers, user_id):
+    plan_id = insert_plan(db, user_id, meals={
+        "Lunes": [{"name": "Desayuno", "ingredients": ["Huevos", "Pan"]}],
+        "Martes": [{"name": "Desayuno", "ingredients": ["huevos"]}, "not-a-meal"],
+    })
+
+    response = client.post(f"/api/shopping-lists/generate/{plan_id}", headers=auth_headers)
+    items = {entry["name"]: entry["quantity"] for entry in response.json()["items"]}
+    assert items == {"Huevos": "2", "Pan": "1"}
+
+
+def test_generating_from_a_missing_plan_is_not_found(client, auth_headers):
+    response = client.post("/api/shopping-lists/generate/missing", headers=auth_headers)
+    assert response.status_code == 404
+
+
+EVALUATION = {
+    "age": 30, "gender": "male", "weight": 80, "height": 180,
+    "activity_level": "sedentary", "goal": "lose_weight", "experience_level": "beginner",
+}
+
+
+def planned_meal(name, ingredients):
+    return {"name": name, "ingredients": ingredients, "calories": 500, "protein": 30, "carbs": 50, "fat": 15, "instructions": ""}
+
+
+def generate_plan(client, monkeypatch, auth_headers, shopping_list):
+    ai_plan = {
+        "plan_name": "Plan", "total_calories": 2000, "duration": "1 día",
+        "days": {"Lunes": {"desayuno": planned_meal("Tortilla", ["Huevos", "Pan"]), "cena": planned_meal("Pollo", ["Pollo"])}},
+        "tips": ["Bebe agua"], "shopping_list": shopping_list,
+    }
+    fake_openai(monkeypatch, tool_call_message(orjson.dumps(ai_plan).decode()))
+    client.put("/api/evaluation", headers=auth_headers, json=EVALUATION)
+    response = client.post("/api/nutrition-plans/generate", headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["plan_id"]
+
+
+@pytest.mark.parametrize("plan_shopping_list, expected", [
+    (["Avena", "Leche"], ["Avena", "Leche"]),
+    ([], ["Huevos", "Pan", "Pollo"]),
+])
+def test_generated_plan_keeps_what_the_shopping_list_is_built_from(
+    client, db, monkeypatch, auth_headers, plan_shopping_list, expected
+):
+    plan_id = generate_plan(client, monkeypatch, auth_headers, plan_shopping_list)
+    stored = run(db.nutrition_plans.find_one({"id": plan_id}))
+    assert stored["tips"] == ["Bebe agua"]
+    assert stored["meals"]["Lunes"][0]["ingredients"] == ["Huevos", "Pan"]
+
+    response = client.post(f"/api/shopping-lists/generate/{plan_id}", headers=auth_headers)
+    assert [entry["name"] for entry in response.json()["items"]] == expected